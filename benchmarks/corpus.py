@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Generate synthetic TwiML documents of configurable sizes for the benchmarks.
+
+Each shape stresses a different part of the generator: `wide` is a long flat Response,
+`deep` nests SSML elements, `ssml` mixes SSML texts and tails in many Say verbs and
+`attributes` gives every verb many attributes of every XSD type.
+"""
+import argparse
+import itertools
+
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def element(name, attributes=None, content='', tail=''):
+    attributes = ''.join(
+        ' {}={}'.format(key, quoteattr(value)) for key, value in (attributes or {}).items()
+    )
+    if not content:
+        return '<{}{}/>{}'.format(name, attributes, tail)
+    return '<{0}{1}>{2}</{0}>{3}'.format(name, attributes, content, tail)
+
+
+def document(verbs):
+    body = ''.join('  {}\n'.format(verb) for verb in verbs)
+    return XML_DECLARATION + '<Response>\n' + body + '</Response>\n'
+
+
+def wide_verbs(index):
+    """Return the `index`th verb of a flat Response, cycling through the common verbs."""
+    return [
+        element('Say', content=escape('Sentence number {} & more'.format(index))),
+        element('Play', content='https://api.example.com/audio/{}.mp3'.format(index)),
+        element('Pause', {'length': str(index % 10 + 1)}),
+        element('Dial', content=element('Number', content='+1555{:07d}'.format(index))),
+        element('Gather', {'numDigits': '1'},
+                element('Say', content='Press {}'.format(index % 10))),
+    ][index % 5]
+
+
+def wide_twiml(size):
+    """Return a Response of `size` sibling verbs, 2 in 5 having a nested noun."""
+    return document(wide_verbs(index) for index in range(size))
+
+
+SSML_CHAIN = ('prosody', 'emphasis', 's', 'p')
+SSML_CHAIN_ATTRIBUTES = {
+    'prosody': {'rate': '85%', 'pitch': '-10%'},
+    'emphasis': {'level': 'moderate'},
+}
+
+
+def deep_say(depth, index):
+    """Return a Say nesting `depth` SSML elements, each with a text and a tail."""
+    content = 'innermost {}'.format(index)
+    for level, name in zip(range(depth, 0, -1), itertools.cycle(SSML_CHAIN)):
+        content = 'level {} '.format(level) + element(
+            name, SSML_CHAIN_ATTRIBUTES.get(name), content, tail=' after {}'.format(level)
+        )
+    return element('Say', {'voice': 'Polly.Joanna'}, content)
+
+
+def deep_twiml(size, depth=50):
+    """Return Say verbs nesting `depth` SSML elements, `size` elements in total.
+
+    lxml refuses documents nested deeper than 255 elements.
+    """
+    return document(deep_say(depth, index) for index in range(max(1, size // (depth + 1))))
+
+
+def ssml_say(index):
+    """Return a Say mixing every SSML element, with texts and tails."""
+    return element('Say', {'voice': 'Polly.Joanna', 'language': 'en-US'}, ''.join([
+        'Hello {} '.format(index),
+        element('break', {'strength': 'x-weak', 'time': '100ms'}, tail='then '),
+        element('emphasis', {'level': 'moderate'}, 'Words to emphasize', tail=' and '),
+        element('p', content='A paragraph'),
+        element('phoneme', {'alphabet': 'x-sampa', 'ph': 'pI\'kA:n'}, 'pecan', tail=' between '),
+        element('prosody', {'pitch': '-10%', 'rate': '85%', 'volume': '-6dB'}, 'Slower'),
+        element('s', content='A sentence'),
+        element('say-as', {'interpret-as': 'spell-out'}, 'ABC', tail=' and '),
+        element('sub', {'alias': 'World Wide Web Consortium'}, 'W3C'),
+        element('w', {'role': 'amazon:VBD'}, 'read', tail=' finally.'),
+    ]))
+
+
+def ssml_twiml(size):
+    """Return Say verbs full of SSML, `size` elements in total (11 per Say)."""
+    return document(ssml_say(index) for index in range(max(1, size // 11)))
+
+
+def attributes_verbs(index):
+    """Return verbs having many attributes, of string, boolean, integer and list types."""
+    url = 'https://example.com/callback/{}'.format(index)
+    return [
+        element('Dial', {
+            'action': url, 'method': 'POST', 'timeout': '20', 'hangupOnStar': 'true',
+            'timeLimit': '600', 'callerId': '+15551234567', 'record': 'record-from-answer',
+            'recordingStatusCallback': url, 'recordingStatusCallbackMethod': 'GET',
+            'recordingStatusCallbackEvent': 'in-progress completed',
+            'trim': 'trim-silence', 'answerOnBridge': 'true', 'ringTone': 'us',
+        }, element('Number', {
+            'sendDigits': 'wwww{}'.format(index % 10), 'url': url, 'method': 'GET',
+            'statusCallback': url, 'statusCallbackEvent': 'initiated ringing answered completed',
+            'statusCallbackMethod': 'POST',
+        }, '+1555{:07d}'.format(index))),
+        element('Gather', {
+            'action': url, 'method': 'GET', 'timeout': '5', 'finishOnKey': '#', 'numDigits': '4',
+            'input': 'dtmf speech', 'hints': 'yes, no', 'language': 'en-GB',
+            'profanityFilter': 'false',
+            'speechTimeout': 'auto', 'partialResultCallback': url, 'actionOnEmptyResult': 'true',
+        }, element('Say', {'voice': 'alice', 'language': 'en-GB', 'loop': '2'}, 'Enter your PIN')),
+        element('Record', {
+            'action': url, 'method': 'POST', 'timeout': '10', 'finishOnKey': '*', 'maxLength': '30',
+            'playBeep': 'false', 'trim': 'do-not-trim', 'recordingStatusCallback': url,
+            'transcribe': 'true', 'transcribeCallback': url,
+        }),
+    ][index % 3]
+
+
+def attributes_twiml(size):
+    """Return verbs having about 12 attributes each, `size` verbs in total."""
+    return document(attributes_verbs(index) for index in range(size))
+
+
+SHAPES = {
+    'wide': wide_twiml,
+    'deep': deep_twiml,
+    'ssml': ssml_twiml,
+    'attributes': attributes_twiml,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('outdir', help='Directory where the documents are written')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    outdir = Path(args.outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    for shape in args.shapes:
+        for size in args.sizes:
+            twiml_filepath = outdir / '{}-{}.xml'.format(shape, size)
+            twiml_filepath.write_text(SHAPES[shape](size), encoding='utf-8')
+            print(twiml_filepath)
+
+
+if __name__ == '__main__':
+    main()
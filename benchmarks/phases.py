@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Benchmark the parse, clean, emit, format and verify phases on a synthetic TwiML corpus.
+
+The timings come from the phase events of twiml_generator.instrumentation. The results are
+written as JSON, and compared with the results of a previous run given with --baseline.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import SHAPES  # noqa: E402
+from twiml_generator import TwimlCodeGenerator, LANGUAGES, instrumentation  # noqa: E402
+from twiml_generator.twiml_code_generator import get_language_emitter  # noqa: E402
+from twiml_generator.twimlir import TwimlIR  # noqa: E402
+
+
+class PhaseRecorder(object):
+    """Listener keeping the durations of every phase, per language."""
+
+    def __init__(self):
+        self.durations = {}
+
+    def __call__(self, event):
+        by_language = self.durations.setdefault(event.phase, {})
+        by_language.setdefault(event.language, []).append(event.duration)
+
+
+def run_once(twiml, languages, workspace, format=True, verify=False):
+    """Parse a TwiML once, then generate (and format, verify) its code in every language."""
+    twimlir = TwimlIR(xml=twiml)
+    for language in languages:
+        code_filepath = Path(workspace) / ('code' + get_language_emitter(language).extension)
+        generator = TwimlCodeGenerator(language=language, twimlir=twimlir, twiml=twiml,
+                                       code_filepath=code_filepath)
+        if format or verify:
+            generator.write_code(format=format)
+        else:
+            str(generator)
+        if verify:
+            generator.verify()
+
+
+def summarize(durations):
+    return {
+        'min': min(durations),
+        'median': statistics.median(durations),
+        'mean': statistics.mean(durations),
+        'runs': len(durations),
+    }
+
+
+def run_case(shape, size, languages, repeat, format=True, verify=False):
+    """Return the timings of a shape and size, as {phase: {language: summary}}."""
+    twiml = SHAPES[shape](size)
+    recorder = PhaseRecorder()
+    with tempfile.TemporaryDirectory(prefix='twiml-bench-') as workspace:
+        # The first run loads the language specs and fills the caches
+        run_once(twiml, languages, workspace, format=format, verify=verify)
+        instrumentation.add_listener(recorder)
+        try:
+            for _ in range(repeat):
+                run_once(twiml, languages, workspace, format=format, verify=verify)
+        finally:
+            instrumentation.remove_listener(recorder)
+    return {
+        'shape': shape,
+        'size': size,
+        # Every element, the Response and the SSML ones included
+        'elements': sum(1 for _ in TwimlIR(xml=twiml).reverse_iter()),
+        'bytes': len(twiml.encode('utf-8')),
+        'phases': {
+            phase: {
+                language or 'all': summarize(durations)
+                for language, durations in by_language.items()
+            }
+            for phase, by_language in recorder.durations.items()
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the (shape, size, phase, language, ratio) whose median regressed.
+
+    A median regressed if it is `threshold` times the one of the baseline or more.
+    """
+    baseline_cases = {(case['shape'], case['size']): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        baseline_case = baseline_cases.get((case['shape'], case['size']))
+        if baseline_case is None:
+            continue
+        for phase, by_language in case['phases'].items():
+            for language, summary in by_language.items():
+                baseline_summary = baseline_case['phases'].get(phase, {}).get(language)
+                if baseline_summary and baseline_summary['median'] > 0:
+                    ratio = summary['median'] / baseline_summary['median']
+                    if ratio >= threshold:
+                        regressions.append((case['shape'], case['size'], phase, language, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('-l', '--language', action='append', choices=LANGUAGES,
+                        help='Language to benchmark (repeatable, defaults to all languages)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-format', action='store_true', help='Skip the format phase')
+    parser.add_argument('--verify', action='store_true',
+                        help='Also run the verification (needs the Helper Libraries)')
+    parser.add_argument('-o', '--output',
+                        help='Write the JSON results in a file instead of the standard output')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Ratio of the baseline median from which a phase is reported '
+                             'as a regression')
+    args = parser.parse_args()
+
+    languages = args.language or LANGUAGES
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'languages': languages,
+        'repeat': args.repeat,
+        'cases': [],
+    }
+    for shape in args.shapes:
+        for size in args.sizes:
+            print('{} {}...'.format(shape, size), file=sys.stderr)
+            results['cases'].append(run_case(shape, size, languages, args.repeat,
+                                             format=not args.no_format, verify=args.verify))
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.threshold)
+        for shape, size, phase, language, ratio in regressions:
+            print('{} {} {} {}: {:.2f}x slower'.format(shape, size, phase, language, ratio),
+                  file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
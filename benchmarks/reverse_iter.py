@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Benchmark TwimlIR.reverse_iter on synthetic wide and deep TwiML trees."""
+import argparse
+import sys
+import timeit
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from twiml_generator.twimlir import TwimlIR, TwimlIRVerb  # noqa: E402
+
+
+def new_verb(name, parent):
+    verb = TwimlIRVerb(name=name, attributes={}, text=None, parent=parent, tail=None, is_ssml=False)
+    if parent:
+        parent.children.append(verb)
+    return verb
+
+
+def build_wide_twimlir(size):
+    """Return an IR of a Dial with `size` Number nouns."""
+    response = new_verb('Response', None)
+    dial = new_verb('Dial', response)
+    for _ in range(size):
+        new_verb('Number', dial)
+    return twimlir_for(response)
+
+
+def build_deep_twimlir(size):
+    """Return an IR of `size` verbs nested in each other, each with a leaf sibling."""
+    response = parent = new_verb('Response', None)
+    for _ in range(size // 2):
+        new_verb('Pause', parent)
+        parent = new_verb('Gather', parent)
+    return twimlir_for(response)
+
+
+def twimlir_for(response):
+    twimlir = object.__new__(TwimlIR)
+    twimlir.response = response
+    return twimlir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('{:<6} {:>8} {:>12} {:>12}'.format('shape', 'verbs', 'best (ms)', 'per verb (us)'))
+    for shape, build in (('wide', build_wide_twimlir), ('deep', build_deep_twimlir)):
+        for size in args.sizes:
+            twimlir = build(size)
+            verbs = sum(1 for _ in twimlir.reverse_iter())
+            best = min(timeit.repeat(lambda: list(twimlir.reverse_iter()), number=1,
+                                     repeat=args.repeat))
+            print('{:<6} {:>8} {:>12.3f} {:>12.3f}'.format(
+                shape, verbs, best * 1e3, best * 1e6 / verbs
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,31 @@
 #!/usr/bin/env python
 # coding: utf-8
-from twiml_generator import TwimlCodeGenerator
+from twiml_generator import TwimlCodeGenerator, LANGUAGES, inflections, instrumentation
+from twiml_generator.batch import find_twiml_files, generate_batch, BatchStats
+from twiml_generator.build_manifest import BuildManifest
+from twiml_generator.comparison import format_differences
+from twiml_generator.server import serve
+from twiml_generator.verification import VerificationScheduler, VerificationResult, \
+    JavaBatchVerifier, CSharpBatchVerifier, InterpreterHarnessPool, VerificationCache
+from twiml_generator.verification.interpreters import HARNESS_SCRIPTS
 import argparse
+import logging
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument("twiml_filepath", help="Path to a TwiML file")
-    parser.add_argument("-l", "--language", help="Language for the code to generate",
-                        choices=['csharp', 'java', 'node', 'php', 'python', 'ruby'])
-    parser.add_argument("-out", "--outpath",  help="[optional] Path to output file")
-    parser.add_argument("--verify",  action='store_false', help="Only runs the verification")
-    parser.add_argument("--messaging", action='store_true',  help="Generate Messaging TwiML rather than Voice TwiML")
-    args = parser.parse_args()
+def format_verify_result(result):
+    if result == TwimlCodeGenerator.VERIFY_SUCCESS:
+        return '\x1B[92m[passed]\x1B[39m'
+    elif result == TwimlCodeGenerator.VERIFY_FAILURE:
+        return '\x1B[91m[failed]\x1B[39m'
+    else:
+        return '\x1B[91m[error]\x1B[39m'
 
-    code_generator = TwimlCodeGenerator(args.twiml_filepath, code_filepath=args.outpath, language=args.language, is_messaging=args.messaging)
+
+def run_single(args):
+    language = args.language[0] if args.language else 'python'
+    code_generator = TwimlCodeGenerator(args.twiml_filepath[0], code_filepath=args.outpath,
+                                        language=language, is_messaging=args.messaging,
+                                        stream=args.stream)
     if args.verify:
         code_generator.write_code()
         print(' CODE GENERATED '.center(80, '='))
@@ -22,13 +33,203 @@ if __name__ == '__main__':
         print('=' * 80)
         print('Written at {}'.format(code_generator.code_filepath))
     print('Running verification on %s:' % code_generator.code_filepath, end='')
-    result, stdout, input_tree, output_tree = code_generator.verify()
-    if result == TwimlCodeGenerator.VERIFY_SUCCESS:
-        print(' \x1B[92m[passed]\x1B[39m')
-    elif result == TwimlCodeGenerator.VERIFY_FAILURE:
-        print(' \x1B[91m[failed]\x1B[39m')
+    result, stdout, input_tree, output_tree = code_generator.verify(cache=get_cache(args))
+    print(' ' + format_verify_result(result))
+    if result == TwimlCodeGenerator.VERIFY_FAILURE:
         print('INPUT:\n' + input_tree)
         print('OUTPUT:\n' + output_tree)
-    else:
-        print(' \x1B[91m[error]\x1B[39m')
+        print('DIFFERENCES:\n' + format_differences(code_generator.differences))
+    elif result == TwimlCodeGenerator.VERIFY_COMPILE_ERROR:
         print(stdout)
+
+
+def parse_language_jobs(value):
+    language, _, jobs = value.partition('=')
+    if language not in LANGUAGES or not jobs.isdigit():
+        raise argparse.ArgumentTypeError('expected LANGUAGE=N, got {}'.format(value))
+    return language, int(jobs)
+
+
+def get_cache(args):
+    return None if args.no_cache else VerificationCache(args.cache_dir)
+
+
+def verify_batch(verifier, generators, cache=None):
+    try:
+        if cache is not None:
+            return cache.verify_batch(verifier.verify, generators)
+        return verifier.verify(generators)
+    except Exception as e:
+        return [VerificationResult(g, None, None, None, None, error=e) for g in generators]
+
+
+def run_batch(args):
+    twiml_filepaths = find_twiml_files(args.twiml_filepath, manifest_filepath=args.manifest)
+    languages = args.language or LANGUAGES
+    stats = BatchStats()
+    batch_items = []
+    batch_verifiers = {}
+    if args.java_batch:
+        batch_verifiers['java'] = JavaBatchVerifier()
+    if args.csharp_batch:
+        batch_verifiers['csharp'] = CSharpBatchVerifier()
+    batch_generators = {language: [] for language in batch_verifiers}
+    cache = get_cache(args)
+    build_manifest = BuildManifest(args.build_manifest) if args.build_manifest else None
+    scheduler = VerificationScheduler(concurrency=dict(args.language_jobs or []),
+                                      default_concurrency=args.jobs, cache=cache)
+    if args.harness:
+        scheduler.runners = {
+            language: InterpreterHarnessPool(language, size=scheduler.get_concurrency(language))
+            for language in languages if language in HARNESS_SCRIPTS
+        }
+    with scheduler:
+        for batch_item in generate_batch(twiml_filepaths, languages=languages, outdir=args.outdir,
+                                         is_messaging=args.messaging, write=args.verify,
+                                         build_manifest=build_manifest,
+                                         require_success=not args.no_verify):
+            stats.add(batch_item)
+            batch_items.append(batch_item)
+            if not args.no_verify:
+                for language, code_generator in batch_item.generators.items():
+                    if language in batch_verifiers:
+                        batch_generators[language].append(code_generator)
+                    else:
+                        scheduler.submit(code_generator)
+        verification_results = {}
+        for language, verifier in batch_verifiers.items():
+            language_results = verify_batch(verifier, batch_generators[language], cache=cache)
+            verification_results.update({r.generator: r for r in language_results})
+        verification_results.update({r.generator: r for r in scheduler.results()})
+    for runner in scheduler.runners.values():
+        runner.close()
+    if cache is not None:
+        cache.evict()
+    if build_manifest is not None:
+        for verification_result in verification_results.values():
+            if verification_result.error is None:
+                build_manifest.record_verify_result(verification_result.generator,
+                                                    verification_result.result)
+        build_manifest.save()
+
+    for batch_item in batch_items:
+        summary = []
+        differences = []
+        for language, code_generator in batch_item.generators.items():
+            if code_generator not in verification_results:
+                summary.append(language)
+                continue
+            verification_result = verification_results[code_generator]
+            if verification_result.error:
+                error = verification_result.error
+                summary.append('{} \x1B[91m[{}: {}]\x1B[39m'.format(
+                    language, type(error).__name__, error
+                ))
+            else:
+                summary.append('{} {}'.format(
+                    language, format_verify_result(verification_result.result)
+                ))
+                if verification_result.result == TwimlCodeGenerator.VERIFY_FAILURE:
+                    lines = format_differences(code_generator.differences).splitlines()
+                    differences.append('  {}:\n{}'.format(language, '\n'.join(
+                        '    ' + line for line in lines
+                    )))
+        for language in batch_item.up_to_date:
+            summary.append('{} [up to date]'.format(language))
+        for language, error in batch_item.errors.items():
+            summary.append('{} \x1B[91m[{}: {}]\x1B[39m'.format(
+                language or 'parse', type(error).__name__, error
+            ))
+        print('{}: {}'.format(batch_item.twiml_filepath, ', '.join(summary)))
+        for language_differences in differences:
+            print(language_differences)
+    print('=' * 80)
+    print(stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("twiml_filepath", nargs='*',
+                        help="Path to a TwiML file "
+                             "(with --batch: TwiML files, directories or globs)")
+    parser.add_argument("-l", "--language", choices=LANGUAGES, action='append',
+                        help="Language for the code to generate "
+                             "(with --batch: repeatable, defaults to all languages)")
+    parser.add_argument("-out", "--outpath",  help="[optional] Path to output file")
+    parser.add_argument("--verify",  action='store_false', help="Only runs the verification")
+    parser.add_argument("--messaging", action='store_true',
+                        help="Generate Messaging TwiML rather than Voice TwiML")
+    parser.add_argument("--stream", action='store_true',
+                        help="Parse and output the code incrementally, for very large TwiML files "
+                             "(not for Java)")
+    parser.add_argument("--timings", action='store_true',
+                        help="Print a histogram of the time spent loading the specs, parsing, "
+                             "cleaning, emitting, formatting and verifying, per language")
+    parser.add_argument("--profile-emit", metavar='FILE',
+                        help="Profile the code emission with cProfile and write the stats in FILE")
+    parser.add_argument("--no-cache", action='store_true',
+                        help="Verify the code even if its result is cached")
+    parser.add_argument("--cache-dir", default='.verification_cache',
+                        help="Directory of the verification cache (default: .verification_cache)")
+    parser.add_argument("--batch", action='store_true',
+                        help="Generate the code of every language for many TwiML files in one run")
+    parser.add_argument("--manifest",
+                        help="[batch] File listing one TwiML file, directory or glob per line")
+    parser.add_argument("--outdir",
+                        help="[batch] Directory where the code is written in a folder per language")
+    parser.add_argument("--no-verify", action='store_true', help="[batch] Skip the verification")
+    parser.add_argument("--build-manifest",
+                        help="[batch] File recording the inputs of the generated code, "
+                             "to only generate and verify the code whose inputs changed")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="[batch] Number of concurrent verifications per language "
+                             "(defaults to the number of CPUs)")
+    parser.add_argument("--language-jobs", type=parse_language_jobs, action='append',
+                        metavar='LANGUAGE=N',
+                        help="[batch] Number of concurrent verifications for a language, "
+                             "overriding --jobs")
+    parser.add_argument("--java-batch", action='store_true',
+                        help="[batch] Compile all the Java code with one javac call "
+                             "and run it in a single JVM")
+    parser.add_argument("--csharp-batch", action='store_true',
+                        help="[batch] Build all the C# code in a single dotnet project "
+                             "and run it in a single process")
+    parser.add_argument("--harness", action='store_true',
+                        help="[batch] Run the Python, Node, PHP and Ruby code "
+                             "in long-lived interpreters")
+    parser.add_argument("--serve", action='store_true',
+                        help="Run a server generating the code of the TwiML posted to /generate")
+    parser.add_argument("--host", default='127.0.0.1',
+                        help="[serve] Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="[serve] Port to listen on (default: 8000)")
+    parser.add_argument("--unix-socket",
+                        help="[serve] Listen on a Unix socket instead of a TCP port")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    timings = instrumentation.TimingHistogram()
+    if args.timings:
+        instrumentation.add_listener(timings)
+    profiler = instrumentation.PhaseProfiler('emit')
+    if args.profile_emit:
+        instrumentation.add_span_hook(profiler)
+
+    if args.serve:
+        serve(host=args.host, port=args.port, unix_socket=args.unix_socket,
+              languages=args.language or LANGUAGES)
+    elif args.batch or args.manifest:
+        run_batch(args)
+    elif len(args.twiml_filepath) != 1 or (args.language and len(args.language) > 1):
+        parser.error('use --batch to generate several TwiML files or languages')
+    else:
+        run_single(args)
+
+    if args.timings:
+        print(' TIMINGS '.center(80, '='))
+        print(timings)
+        for name, info in inflections.cache_info().items():
+            print('{:<10} {} hits, {} misses'.format(name, info.hits, info.misses))
+    if args.profile_emit:
+        profiler.dump(args.profile_emit)
+        print('Emit profile of {} spans written at {}'.format(profiler.spans, args.profile_emit))
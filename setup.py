@@ -7,7 +7,7 @@ setup(name='twiml-generator',
       author='Samuel Mendes',
       author_email='smendes@twilio.com',
       license='MIT',
-      packages=['twiml_generator'],
+      packages=['twiml_generator', 'twiml_generator.specificity', 'twiml_generator.verification'],
       include_package_data=True,
       install_requires=[
           'lxml',
@@ -1 +1,3 @@
-from .twiml_code_generator import TwimlCodeGenerator, load_language_spec
+from .twiml_code_generator import TwimlCodeGenerator, load_language_spec, LANGUAGES
+from .emitter import LanguageSpecError
+from .fanout import generate_languages
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+import glob
+import logging
+import time
+
+from collections import namedtuple
+from pathlib import Path
+
+from .formatting import FormattingError, format_files
+from .instrumentation import timed
+from .twiml_code_generator import TwimlCodeGenerator, LANGUAGES, get_language_emitter
+from .twimlir import TwimlIR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+BatchItem = namedtuple('BatchItem', ['twiml_filepath', 'generators', 'errors', 'up_to_date'])
+"""Result of a batch run for one TwiML file.
+
+`generators` maps each successfully generated language to its TwimlCodeGenerator,
+`errors` maps each failed language (or None if the TwiML itself failed) to the exception,
+`up_to_date` maps each language skipped thanks to the build manifest to its code file.
+"""
+
+
+def find_twiml_files(inputs, manifest_filepath=None):
+    """Return the TwiML files found in a list of files, directories or globs.
+
+    Directories are searched recursively for `.xml` files. A manifest file lists
+    one input per line, blank lines and lines starting with `#` being ignored,
+    relative paths being resolved from the manifest location.
+    """
+    inputs = [Path(i) for i in inputs]
+    if manifest_filepath:
+        manifest_filepath = Path(manifest_filepath)
+        for line in manifest_filepath.read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                inputs.append(manifest_filepath.parent / line)
+
+    twiml_filepaths = []
+    for path in inputs:
+        if path.is_dir():
+            twiml_filepaths.extend(sorted(path.rglob('*.xml')))
+        elif glob.has_magic(str(path)):
+            twiml_filepaths.extend(sorted(Path(p) for p in glob.glob(str(path), recursive=True)))
+        else:
+            twiml_filepaths.append(path)
+
+    seen = set()
+    unique_twiml_filepaths = []
+    for twiml_filepath in twiml_filepaths:
+        if twiml_filepath.resolve() not in seen:
+            seen.add(twiml_filepath.resolve())
+            unique_twiml_filepaths.append(twiml_filepath)
+    return unique_twiml_filepaths
+
+
+def get_batch_code_filepath(twiml_filepath, language, outdir=None):
+    """Return the path of the code generated in `outdir` for a TwiML file and a language.
+
+    Without `outdir`, it is the same path as TwimlCodeGenerator.get_code_filepath().
+    """
+    if not outdir:
+        outdir = twiml_filepath.resolve().parent.parent / 'generators'
+    language_dirpath = Path(outdir) / language
+    language_dirpath.mkdir(parents=True, exist_ok=True)
+    extension = get_language_emitter(language).extension
+    return language_dirpath / twiml_filepath.name.replace('.xml', extension)
+
+
+def generate_batch(twiml_filepaths, languages=LANGUAGES, outdir=None, is_messaging=False,
+                   write=True, build_manifest=None, require_success=False, chunk_size=50):
+    """Generate the code of every language for each TwiML file, yielding a BatchItem per file.
+
+    Each TwiML file is parsed once and its IR is shared by every language.
+    With a BuildManifest, the code files that are up to date are not generated again,
+    nor the ones that were not verified successfully if `require_success` is set.
+    The code that cannot be formatted in-process is formatted by running the formatter
+    command once for every `chunk_size` TwiML files.
+    """
+    twiml_filepaths = list(twiml_filepaths)
+    for start in range(0, len(twiml_filepaths), chunk_size):
+        batch_items = [
+            generate_file(twiml_filepath, languages, outdir, is_messaging, write, build_manifest,
+                          require_success)
+            for twiml_filepath in twiml_filepaths[start:start + chunk_size]
+        ]
+        if write:
+            format_batch(batch_items)
+            if build_manifest is not None:
+                for batch_item in batch_items:
+                    for language, generator in batch_item.generators.items():
+                        if language not in batch_item.errors:
+                            build_manifest.record(generator, is_messaging=is_messaging)
+        yield from batch_items
+
+
+def generate_file(twiml_filepath, languages, outdir, is_messaging, write, build_manifest,
+                  require_success):
+    """Generate the code of every language for a TwiML file, returning a BatchItem."""
+    twiml_filepath = Path(twiml_filepath)
+    generators, errors, up_to_date = {}, {}, {}
+    code_filepaths = {}
+    for language in languages:
+        try:
+            code_filepaths[language] = get_batch_code_filepath(twiml_filepath, language, outdir)
+            if write and build_manifest is not None and build_manifest.is_up_to_date(
+                    twiml_filepath, code_filepaths[language], language, is_messaging=is_messaging,
+                    require_success=require_success):
+                up_to_date[language] = code_filepaths.pop(language)
+        except Exception as e:
+            logger.debug('Cannot check %s code for %s: %s', language, twiml_filepath, e)
+            errors[language] = e
+            code_filepaths.pop(language, None)
+    if not code_filepaths:
+        return BatchItem(twiml_filepath, generators, errors, up_to_date)
+
+    try:
+        twimlir = TwimlIR(twiml_filepath)
+    except Exception as e:
+        logger.debug('Cannot parse %s: %s', twiml_filepath, e)
+        errors[None] = e
+        return BatchItem(twiml_filepath, generators, errors, up_to_date)
+
+    for language, code_filepath in code_filepaths.items():
+        try:
+            generator = TwimlCodeGenerator(
+                twiml_filepath,
+                code_filepath=code_filepath,
+                language=language,
+                is_messaging=is_messaging,
+                twimlir=twimlir
+            )
+            if write:
+                try:
+                    # Only the in-process formatting, the formatter commands run once per chunk
+                    generator.write_code(format=generator.has_in_process_formatter)
+                except FormattingError as e:
+                    # The code is written unformatted, it can still be verified
+                    errors[language] = e
+            generators[language] = generator
+        except Exception as e:
+            logger.debug('Cannot generate %s code for %s: %s', language, twiml_filepath, e)
+            errors[language] = e
+    return BatchItem(twiml_filepath, generators, errors, up_to_date)
+
+
+def format_batch(batch_items):
+    """Run each formatter command once on all the written code that is not formatted in-process."""
+    to_format = {}
+    for batch_item in batch_items:
+        for language, generator in batch_item.generators.items():
+            formatter_command = generator.emitter.formatter
+            if not formatter_command or generator.has_in_process_formatter:
+                continue
+            if language not in batch_item.errors:
+                to_format.setdefault(formatter_command, []).append(
+                    (batch_item, language, generator)
+                )
+
+    for formatter_command, formatted in to_format.items():
+        try:
+            with timed('format', formatted[0][1]):
+                format_files(formatter_command,
+                             [generator.code_filepath for _, _, generator in formatted])
+        except FormattingError as e:
+            for batch_item, language, _ in formatted:
+                batch_item.errors[language] = e
+
+
+class BatchStats(object):
+    """Counters to report the throughput of a batch run."""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.files = 0
+        self.snippets = 0
+        self.up_to_date = 0
+        self.errors = 0
+
+    def add(self, batch_item):
+        self.files += 1
+        self.snippets += len(batch_item.generators)
+        self.up_to_date += len(batch_item.up_to_date)
+        self.errors += len(batch_item.errors)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def __str__(self):
+        elapsed = self.elapsed
+        return '{files} files, {snippets} snippets, {up_to_date} up to date, ' \
+               '{errors} errors in {elapsed:.2f}s ' \
+               '({files_rate:.1f} files/s, {snippets_rate:.1f} snippets/s)'.format(
+                   files=self.files,
+                   snippets=self.snippets,
+                   up_to_date=self.up_to_date,
+                   errors=self.errors,
+                   elapsed=elapsed,
+                   files_rate=self.files / elapsed if elapsed else 0,
+                   snippets_rate=self.snippets / elapsed if elapsed else 0
+               )
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding: utf-8
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import tempfile
+
+from functools import lru_cache
+from pathlib import Path
+
+from .formatting import IN_PROCESS_FORMATTERS, get_formatter_name
+from .twiml_code_generator import TwimlCodeGenerator, get_language_emitter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PACKAGE_DIRPATH = Path(__file__).parent
+
+
+def hash_file(filepath):
+    return hashlib.sha256(Path(filepath).read_bytes()).hexdigest()
+
+
+def formatter_version(formatter_command):
+    """Return the version of the library of a formatter, '' if it is not a known library."""
+    name = get_formatter_name(formatter_command)
+    if name not in IN_PROCESS_FORMATTERS:
+        return ''
+    try:
+        return importlib.metadata.version(IN_PROCESS_FORMATTERS[name][0])
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+@lru_cache(maxsize=None)
+def language_fingerprint(language):
+    """Return the hashes of the spec and of the code generating and formatting a language.
+
+    They are computed once per process, along with the version of the formatter.
+    """
+    generator_sources = [
+        PACKAGE_DIRPATH / 'twiml_code_generator.py',
+        PACKAGE_DIRPATH / 'emitter.py',
+        PACKAGE_DIRPATH / 'twimlir.py',
+        PACKAGE_DIRPATH / 'formatting.py',
+        PACKAGE_DIRPATH / 'inflections.py',
+        PACKAGE_DIRPATH / 'specificity' / 'common.py',
+        PACKAGE_DIRPATH / 'specificity' / (language + '.py'),
+    ]
+    digest = hashlib.sha256()
+    for source in generator_sources:
+        digest.update(hash_file(source).encode())
+    return {
+        'spec': hash_file(PACKAGE_DIRPATH / 'languages_specs' / (language + '.json')),
+        'specificity': digest.hexdigest(),
+        'formatter': formatter_version(get_language_emitter(language).formatter),
+    }
+
+
+class BuildManifest(object):
+    """Record of the inputs every generated file was built from, to skip the up-to-date ones.
+
+    For each written file, the manifest stores the hashes of the TwiML, of the language
+    spec, of the generator, formatting and specificity modules and of the written code,
+    the version of the formatter, along with the last verification result.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        try:
+            with self.filepath.open(encoding='utf-8') as f:
+                self.outputs = json.load(f)['outputs']
+        except FileNotFoundError:
+            self.outputs = {}
+
+    @staticmethod
+    def key(code_filepath):
+        return str(Path(code_filepath).resolve())
+
+    @staticmethod
+    def get_inputs(twiml_filepath, language, is_messaging):
+        inputs = {
+            'twiml': hash_file(twiml_filepath),
+            'language': language,
+            'is_messaging': is_messaging,
+        }
+        inputs.update(language_fingerprint(language))
+        return inputs
+
+    def is_up_to_date(self, twiml_filepath, code_filepath, language, is_messaging=False,
+                      require_success=False):
+        """True if the code file was written from the same inputs and not modified since.
+
+        With `require_success`, the code must also have been verified successfully.
+        """
+        output = self.outputs.get(self.key(code_filepath))
+        if not output:
+            return False
+        if output['inputs'] != self.get_inputs(twiml_filepath, language, is_messaging):
+            return False
+        if require_success and output.get('verify_result') != TwimlCodeGenerator.VERIFY_SUCCESS:
+            return False
+        try:
+            return output['code'] == hash_file(code_filepath)
+        except OSError:
+            return False
+
+    def get_verify_result(self, code_filepath):
+        """Return the last verification result recorded for a code file, None if never verified."""
+        return self.outputs.get(self.key(code_filepath), {}).get('verify_result')
+
+    def record(self, generator, is_messaging=False):
+        """Record the inputs of the code written by a generator."""
+        self.outputs[self.key(generator.code_filepath)] = {
+            'inputs': self.get_inputs(generator.twiml_filepath, generator.emitter.language,
+                                      is_messaging),
+            'code': hash_file(generator.code_filepath),
+            'verify_result': None,
+        }
+
+    def record_verify_result(self, generator, result):
+        """Record the verification result of the code written by a generator."""
+        if self.key(generator.code_filepath) in self.outputs:
+            self.outputs[self.key(generator.code_filepath)]['verify_result'] = result
+
+    def save(self):
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=str(self.filepath.parent), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'outputs': self.outputs}, f, indent=2, sort_keys=True)
+        os.replace(tmp_filepath, str(self.filepath))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding: utf-8
+import hashlib
+
+from collections import namedtuple
+
+from .twimlir import TwimlIR
+
+Difference = namedtuple('Difference', ['path', 'kind', 'expected', 'actual'])
+"""A difference between two TwiML documents.
+
+`path` addresses the element like an XPath, e.g. `/Response/Gather[1]/Say[2]` for the second
+Say of the first Gather, followed by `/@name` for an attribute. `kind` is one of 'tag',
+'attribute', 'text', 'tail' or 'children' (the number of children), `expected` and `actual`
+are the values of the first and second document (None for a missing attribute).
+"""
+
+CanonicalNode = namedtuple('CanonicalNode', [
+    'tag', 'attributes', 'text', 'tail', 'children', 'digest'
+])
+"""An element with its attributes sorted, its texts cleaned and the digest of its whole subtree."""
+
+
+def canonicalize(element):
+    """Return the CanonicalNode of an lxml element, built iteratively from the leaves."""
+    # Each entry is an element and the canonical nodes of the children already built
+    stack = [(element, [])]
+    while True:
+        current, children = stack[-1]
+        if len(children) < len(current):
+            stack.append((current[len(children)], []))
+            continue
+        stack.pop()
+        attributes = tuple(sorted(current.attrib.items()))
+        text = TwimlIR.clean_text(current.text)
+        tail = TwimlIR.clean_text(current.tail)
+        digest = hashlib.sha1(repr((current.tag, attributes, text, tail)).encode('utf-8'))
+        for child in children:
+            digest.update(child.digest)
+        node = CanonicalNode(current.tag, attributes, text, tail, tuple(children), digest.digest())
+        if not stack:
+            return node
+        stack[-1][1].append(node)
+
+
+def child_paths(path, children):
+    """Yield the path of each child, indexed among the siblings having the same tag."""
+    counts = {}
+    for child in children:
+        counts[child.tag] = counts.get(child.tag, 0) + 1
+        yield '{}/{}[{}]'.format(path, child.tag, counts[child.tag])
+
+
+def compare_trees(expected, actual, max_differences=10):
+    """Return the first `max_differences` Differences between two lxml elements, [] if equal.
+
+    Both documents are canonicalized once, the subtrees having the same digest are skipped.
+    The texts are compared once cleaned, the attributes regardless of their order.
+    """
+    differences = []
+    expected, actual = canonicalize(expected), canonicalize(actual)
+    stack = [('/' + expected.tag, expected, actual)]
+    while stack and len(differences) < max_differences:
+        path, a, b = stack.pop()
+        if a.digest == b.digest:
+            continue
+        if a.tag != b.tag:
+            # The subtrees of different elements are not comparable
+            differences.append(Difference(path, 'tag', a.tag, b.tag))
+            continue
+        a_attributes, b_attributes = dict(a.attributes), dict(b.attributes)
+        for name in sorted(a_attributes.keys() | b_attributes.keys()):
+            if a_attributes.get(name) != b_attributes.get(name):
+                differences.append(Difference(
+                    '{}/@{}'.format(path, name), 'attribute',
+                    a_attributes.get(name), b_attributes.get(name)
+                ))
+        if a.text != b.text:
+            differences.append(Difference(path, 'text', a.text, b.text))
+        if a.tail != b.tail:
+            differences.append(Difference(path, 'tail', a.tail, b.tail))
+        if len(a.children) != len(b.children):
+            differences.append(Difference(path, 'children', len(a.children), len(b.children)))
+        # The children still paired are compared, in the document order
+        pairs = list(zip(child_paths(path, a.children), a.children, b.children))
+        stack.extend(reversed(pairs))
+    return differences[:max_differences]
+
+
+def etree_element_eq(a, b):
+    """Return True if two lxml elements have the same tags, attributes, cleaned texts, children."""
+    return not compare_trees(a, b, max_differences=1)
+
+
+def format_differences(differences):
+    """Return a line per Difference."""
+    return '\n'.join(
+        '{} {}: expected {!r}, got {!r}'.format(d.path, d.kind, d.expected, d.actual)
+        for d in differences
+    )
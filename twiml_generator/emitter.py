@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# coding: utf-8
+import re
+import string
+
+from collections import namedtuple
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from .inflections import camelize, underscore
+
+
+class LanguageSpecError(ValueError):
+    """Raised when a language specifications file is malformed."""
+
+
+class Template(object):
+    """A `str.format` template of a language spec, knowing the fields it uses."""
+
+    __slots__ = ('format_string', 'fields')
+
+    def __init__(self, format_string, fields):
+        self.format_string = format_string
+        self.fields = fields
+
+    def __call__(self, **values):
+        return self.format_string.format(**values)
+
+    def __repr__(self):
+        return 'Template({!r})'.format(self.format_string)
+
+
+VERB_FIELDS = ('variable', 'method', 'parent', 'attributes', 'klass', 'text', 'appends', 'indent')
+
+# Fields each template of a spec can use
+TEMPLATES_FIELDS = {
+    'new_variable': VERB_FIELDS,
+    'new_block': VERB_FIELDS,
+    'new_leaf': VERB_FIELDS,
+    'append': ('parent', 'klass', 'variable', 'indent'),
+    'new_text': ('parent', 'text', 'indent'),
+    'chained_append': ('method', 'variable'),
+    'text_format': ('text',),
+    'attribute_format': ('name', 'value'),
+    'attributes_wrapper_format': ('attributes',),
+    'new_klass': ('klass',),
+    'import_voice': ('imports',),
+    'import_messaging': ('imports',),
+    'import_common': ('imports',),
+    'code_wrapper': ('imports', 'classname', 'code', 'print'),
+}
+
+REQUIRED_KEYS = (
+    'language', 'extension', 'voice_class', 'messaging_class', 'add_imports',
+    'import_voice', 'import_messaging', 'code_wrapper', 'code_wrapper_padding',
+    'new_variable', 'new_leaf', 'new_text', 'text_format', 'attribute_format', 'print',
+)
+
+KEYS_TYPES = {
+    'language': str,
+    'extension': str,
+    'voice_class': str,
+    'messaging_class': str,
+    'print': str,
+    'formatter': str,
+    'string_quote': str,
+    'attribute_join': str,
+    'add_imports': str,
+    'method_name_style': str,
+    'variable_name_style': str,
+    'attribute_name_style': str,
+    'code_wrapper_padding': int,
+    'depth_padding': int,
+    'use_boolean': bool,
+    'optional_parentheses': bool,
+    'reverse_build': bool,
+    'chain_calls': bool,
+    'use_semicolon': bool,
+    'declare_class': bool,
+    'necessary_imports': (list, tuple),
+    'common_classes': (list, tuple),
+    'attributes_map': Mapping,
+}
+KEYS_TYPES.update((key, str) for key in TEMPLATES_FIELDS)
+
+
+def lower_camelize(name):
+    return camelize(name, False)
+
+
+def camelize_attribute(name):
+    return lower_camelize(underscore(name))
+
+
+def keep(name):
+    return name
+
+
+METHOD_NAME_STYLES = {
+    None: str.lower,
+    'camelize': lower_camelize,
+    'pascalize': camelize,
+    'underscore': underscore,
+}
+VARIABLE_NAME_STYLES = {
+    None: str.lower,
+    'camelize': lower_camelize,
+    'pascalize': camelize,
+}
+ATTRIBUTE_NAME_STYLES = {
+    None: keep,
+    'camelize': camelize_attribute,
+    'underscore': underscore,
+}
+ADD_IMPORTS = ('fixed', 'single_line', 'multiple_lines')
+
+
+LanguageEmitter = namedtuple('LanguageEmitter', [
+    'spec', 'language', 'extension', 'voice_class', 'messaging_class', 'print', 'formatter',
+    'method_name', 'variable_name', 'attribute_name',
+    'new_variable', 'new_block', 'new_leaf', 'append', 'new_text', 'chained_append', 'text_format',
+    'attribute_format', 'attributes_wrapper_format', 'new_klass',
+    'import_voice', 'import_messaging', 'import_common', 'code_wrapper',
+    'add_imports', 'necessary_imports', 'common_classes', 'attributes_map', 'string_quote',
+    'attribute_join', 'use_boolean', 'optional_parentheses', 'reverse_build',
+    'code_wrapper_padding', 'depth_padding',
+])
+"""A language spec compiled for the code generation.
+
+The name styles are resolved to functions, the templates to Template instances
+(None if not in the spec), and `spec` is a read-only view of the spec.
+"""
+
+
+def freeze(value):
+    """Return a read-only copy of a JSON value."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def compile_template(language, key, format_string):
+    """Return a Template, raising a LanguageSpecError if it uses unknown fields."""
+    fields = []
+    try:
+        for _, field_name, _, _ in string.Formatter().parse(format_string):
+            if field_name is None:
+                continue
+            field = re.split(r'[.\[]', field_name, maxsplit=1)[0]
+            if field not in TEMPLATES_FIELDS[key]:
+                raise LanguageSpecError(
+                    '{} spec: unknown field {{{}}} in {}, expected one of {}'.format(
+                        language, field_name, key, ', '.join(TEMPLATES_FIELDS[key])
+                    )
+                )
+            if field not in fields:
+                fields.append(field)
+    except ValueError as e:
+        if isinstance(e, LanguageSpecError):
+            raise
+        raise LanguageSpecError('{} spec: malformed {}: {}'.format(language, key, e)) from e
+    return Template(format_string, tuple(fields))
+
+
+def get_style(language, spec, key, styles):
+    style = spec.get(key)
+    if style not in styles:
+        raise LanguageSpecError('{} spec: unknown {} {!r}, expected one of {}'.format(
+            language, key, style, ', '.join(s for s in styles if s)
+        ))
+    return styles[style]
+
+
+def validate_language_spec(spec):
+    """Raise a LanguageSpecError if a language spec has missing, unknown or mistyped keys."""
+    if not isinstance(spec, Mapping):
+        raise LanguageSpecError('A language spec must be a JSON object')
+    language = spec.get('language', '?')
+    required_keys = REQUIRED_KEYS if spec.get('reverse_build') else REQUIRED_KEYS + ('append',)
+    missing_keys = [key for key in required_keys if key not in spec]
+    if missing_keys:
+        raise LanguageSpecError('{} spec: missing {}'.format(language, ', '.join(missing_keys)))
+    for key, value in spec.items():
+        if key not in KEYS_TYPES:
+            raise LanguageSpecError('{} spec: unknown key {}'.format(language, key))
+        # bool is a subclass of int, but a padding cannot be a boolean
+        is_boolean_int = KEYS_TYPES[key] is int and isinstance(value, bool)
+        if not isinstance(value, KEYS_TYPES[key]) or is_boolean_int:
+            raise LanguageSpecError('{} spec: {} has the wrong type {}'.format(
+                language, key, type(value).__name__
+            ))
+    for key in ('necessary_imports', 'common_classes'):
+        if not all(isinstance(item, str) for item in spec.get(key, ())):
+            raise LanguageSpecError('{} spec: {} must be a list of strings'.format(language, key))
+    for name, values in spec.get('attributes_map', {}).items():
+        if not isinstance(values, Mapping) or not all(isinstance(v, str) for v in values.values()):
+            raise LanguageSpecError('{} spec: attributes_map.{} must map values to strings'.format(
+                language, name
+            ))
+    if spec['add_imports'] not in ADD_IMPORTS:
+        raise LanguageSpecError('{} spec: unknown add_imports {!r}, expected one of {}'.format(
+            language, spec['add_imports'], ', '.join(ADD_IMPORTS)
+        ))
+
+
+def compile_language_spec(spec):
+    """Validate a language spec and compile it into a LanguageEmitter.
+
+    A LanguageSpecError is raised if the spec is malformed.
+    """
+    validate_language_spec(spec)
+    spec = freeze(spec)
+    language = spec['language']
+    templates = {
+        key: compile_template(language, key, spec[key]) if key in spec else None
+        for key in TEMPLATES_FIELDS
+    }
+    return LanguageEmitter(
+        spec=spec,
+        language=language,
+        extension=spec['extension'],
+        voice_class=spec['voice_class'],
+        messaging_class=spec['messaging_class'],
+        print=spec['print'],
+        formatter=spec.get('formatter'),
+        method_name=get_style(language, spec, 'method_name_style', METHOD_NAME_STYLES),
+        variable_name=get_style(language, spec, 'variable_name_style', VARIABLE_NAME_STYLES),
+        attribute_name=get_style(language, spec, 'attribute_name_style', ATTRIBUTE_NAME_STYLES),
+        add_imports=spec['add_imports'],
+        necessary_imports=spec.get('necessary_imports', ()),
+        common_classes=frozenset(spec.get('common_classes', ())),
+        attributes_map=spec.get('attributes_map', MappingProxyType({})),
+        string_quote=spec.get('string_quote'),
+        attribute_join=spec.get('attribute_join', ', '),
+        use_boolean=spec.get('use_boolean', False),
+        optional_parentheses=spec.get('optional_parentheses', False),
+        reverse_build=spec.get('reverse_build', False),
+        code_wrapper_padding=spec['code_wrapper_padding'],
+        depth_padding=spec.get('depth_padding', 0),
+        **templates
+    )
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from .twiml_code_generator import TwimlCodeGenerator, LANGUAGES
+from .twimlir import TwimlIR
+
+POOLS = {
+    'thread': ThreadPoolExecutor,
+    'process': ProcessPoolExecutor,
+}
+
+
+def generate_language_code(language, twiml_filepath=None, twiml=None, twimlir=None,
+                           is_messaging=False, format=True):
+    """Return the code of a TwiML for one language."""
+    generator = TwimlCodeGenerator(twiml_filepath, language=language, is_messaging=is_messaging,
+                                   twimlir=twimlir, twiml=twiml)
+    return generator.generate_code(format=format)
+
+
+def generate_languages(twiml_filepath=None, twiml=None, languages=LANGUAGES, is_messaging=False,
+                       format=True, pool=None, max_workers=None):
+    """Return the code of a TwiML file, or of a TwiML string, as a dict of language to code.
+
+    The TwiML is parsed once and its IR is shared by every language, nothing is written on disk.
+    With `pool` set to 'thread' or 'process', the languages are generated concurrently by up to
+    `max_workers` threads or processes. Each process parses the TwiML again, but the languages are
+    then cleaned, emitted and formatted in parallel.
+    """
+    if twiml_filepath is None and twiml is None:
+        raise ValueError('A TwiML file path or a TwiML string is needed')
+    if pool is not None and pool not in POOLS:
+        raise ValueError('Unknown pool {}, expected one of {}'.format(pool, ', '.join(POOLS)))
+    if twiml is not None and hasattr(twiml, 'read'):
+        twiml = twiml.read()
+    languages = list(languages)
+
+    if pool == 'process':
+        # The IR is not sent to the processes, the TwiML is cheaper to send and to parse again
+        if twiml is None:
+            twiml = Path(twiml_filepath).read_bytes()
+        twimlir = None
+    else:
+        twimlir = TwimlIR(twiml_filepath, xml=twiml)
+    generate = partial(generate_language_code, twiml_filepath=twiml_filepath, twiml=twiml,
+                       twimlir=twimlir, is_messaging=is_messaging, format=format)
+
+    # An executor needs at least one worker
+    if pool is None or not languages:
+        return {language: generate(language) for language in languages}
+    with POOLS[pool](max_workers=max_workers or len(languages)) as executor:
+        return dict(zip(languages, executor.map(generate, languages)))
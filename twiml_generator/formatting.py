@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+import logging
+import shlex
+import subprocess
+
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class FormattingError(Exception):
+    """Raised when generated code cannot be formatted."""
+
+
+def format_with_yapf(code):
+    from yapf.yapflib.yapf_api import FormatCode
+    return FormatCode(code)[0]
+
+
+def format_with_jsbeautifier(code):
+    import jsbeautifier
+    options = jsbeautifier.default_options()
+    options.end_with_newline = True
+    return jsbeautifier.beautify(code, options)
+
+
+# Formatter commands that can run in-process, with the library they need
+IN_PROCESS_FORMATTERS = {
+    'yapf': ('yapf', format_with_yapf),
+    'js-beautify': ('jsbeautifier', format_with_jsbeautifier),
+}
+
+
+def get_formatter_name(formatter_command):
+    return formatter_command.split()[0] if formatter_command and formatter_command.strip() else None
+
+
+@lru_cache(maxsize=None)
+def get_in_process_formatter(formatter_command):
+    """Return a function formatting code in-process like a formatter command, or None."""
+    name = get_formatter_name(formatter_command)
+    if name not in IN_PROCESS_FORMATTERS:
+        return None
+    module_name, formatter = IN_PROCESS_FORMATTERS[name]
+    try:
+        __import__(module_name)
+    except ImportError:
+        logger.debug('%s is not installed, %s will run as a command', module_name, name)
+        return None
+    return formatter
+
+
+def format_code_string(code, formatter_command):
+    """Return the code formatted in-process like a formatter command.
+
+    A FormattingError is raised on failure.
+    """
+    formatter = get_in_process_formatter(formatter_command)
+    try:
+        return formatter(code)
+    except Exception as e:
+        raise FormattingError('{} failed: {}'.format(
+            get_formatter_name(formatter_command), e
+        )) from e
+
+
+def get_format_command(formatter_command, filepaths):
+    """Return the shell command formatting files, None if there is nothing to run."""
+    filepaths = [str(filepath) for filepath in filepaths]
+    if not get_formatter_name(formatter_command) or not filepaths:
+        return None
+    quoted_filepaths = ' '.join(shlex.quote(filepath) for filepath in filepaths)
+    return formatter_command.format(filepath=quoted_filepaths)
+
+
+def format_files(formatter_command, filepaths):
+    """Run a formatter command once on many files, raising a FormattingError on failure.
+
+    The `{filepath}` placeholder of the command is replaced by all the file paths.
+    """
+    filepaths = [str(filepath) for filepath in filepaths]
+    format_cmd = get_format_command(formatter_command, filepaths)
+    if not format_cmd:
+        return
+    logger.debug('Running: %s', format_cmd)
+    p = subprocess.run([format_cmd], shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if p.returncode != 0:
+        raise FormattingError('{} failed on {}: {}'.format(
+            get_formatter_name(formatter_command), ', '.join(filepaths),
+            p.stderr.decode(errors='replace').strip()
+        ))
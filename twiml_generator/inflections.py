@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# coding: utf-8
+import inflection
+
+from functools import lru_cache
+
+# The names inflected are verb and attribute names, and a few attribute values
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def camelize(string, uppercase_first_letter=True):
+    """Memoized inflection.camelize()."""
+    return inflection.camelize(string, uppercase_first_letter)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def underscore(word):
+    """Memoized inflection.underscore()."""
+    return inflection.underscore(word)
+
+
+def cache_info():
+    """Return the hits and misses of the inflection caches, by function name."""
+    return {
+        'camelize': camelize.cache_info(),
+        'underscore': underscore.cache_info(),
+    }
+
+
+def cache_clear():
+    camelize.cache_clear()
+    underscore.cache_clear()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+import cProfile
+import logging
+import math
+import threading
+import time
+
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PHASES = ('load', 'parse', 'clean', 'emit', 'format', 'verify')
+
+PhaseEvent = namedtuple('PhaseEvent', ['phase', 'duration', 'language', 'source'])
+"""Timing of a phase of the code generation.
+
+`language` is None for the parsing, `source` is the TwiML file path (None for a TwiML string
+or for a phase run on many files at once, e.g. a batch verification).
+"""
+
+_listeners = []
+_span_hooks = []
+
+
+def add_listener(listener):
+    """Call `listener(event)` with a PhaseEvent at the end of every phase."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+def add_span_hook(hook):
+    """Call `hook(phase, language, source)` at the start of every phase.
+
+    The hook returns a context manager, exited at the end of the phase (e.g. to profile it).
+    """
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook):
+    _span_hooks.remove(hook)
+
+
+@contextmanager
+def timed(phase, language=None, source=None):
+    """Time a phase of the code generation, if any listener or span hook is registered."""
+    if not _listeners and not _span_hooks:
+        yield
+        return
+    source = str(source) if source is not None else None
+    with ExitStack() as spans:
+        for hook in list(_span_hooks):
+            spans.enter_context(hook(phase, language, source))
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            event = PhaseEvent(phase, time.perf_counter() - start_time, language, source)
+            for listener in list(_listeners):
+                listener(event)
+
+
+def log_event(event):
+    """Listener logging every phase event."""
+    logger.info('%s %s %s: %.6fs', event.phase, event.language or '-', event.source or '<string>',
+                event.duration)
+
+
+class TimingHistogram(object):
+    """Listener counting the durations of every phase and language in logarithmic buckets."""
+
+    # Upper bounds of the buckets, in seconds, the last bucket being unbounded
+    BOUNDS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+    LABELS = ('<10us', '<100us', '<1ms', '<10ms', '<100ms', '<1s', '<10s', '>=10s')
+
+    def __init__(self):
+        self.buckets = {}
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_bucket(cls, duration):
+        if duration <= 0:
+            return 0
+        return min(len(cls.BOUNDS), max(0, math.floor(math.log10(duration)) + 6))
+
+    def __call__(self, event):
+        bucket = self.get_bucket(event.duration)
+        with self.lock:
+            # The phases run for all the languages at once (e.g. the parsing) only have a total
+            keys = [(event.phase, None)]
+            if event.language is not None:
+                keys.append((event.phase, event.language))
+            for key in keys:
+                self.buckets.setdefault(key, [0] * len(self.LABELS))[bucket] += 1
+                self.durations[key] = self.durations.get(key, 0.0) + event.duration
+
+    def __str__(self):
+        width = max(
+            [len(phase) + len(language or '') + 3 for phase, language in self.buckets] + [10]
+        )
+        lines = ['{:<{}} {:>7} {:>10} '.format('phase', width, 'calls', 'total') + ' '.join(
+            '{:>7}'.format(label) for label in self.LABELS
+        )]
+        phases = sorted(self.buckets, key=lambda key: (
+            PHASES.index(key[0]) if key[0] in PHASES else len(PHASES), key[0], key[1] or ''
+        ))
+        for phase, language in phases:
+            buckets = self.buckets[phase, language]
+            name = phase if language is None else '  {} {}'.format(phase, language)
+            lines.append(
+                '{:<{}} {:>7} {:>9.3f}s '.format(
+                    name, width, sum(buckets), self.durations[phase, language]
+                ) + ' '.join('{:>7}'.format(count or '.') for count in buckets)
+            )
+        return '\n'.join(lines)
+
+
+class PhaseProfiler(object):
+    """Span hook profiling every span of a phase (the emit phase by default) with cProfile.
+
+    The spans are profiled one thread at a time, the spans run meanwhile by other threads are
+    skipped.
+    """
+
+    def __init__(self, phase='emit'):
+        self.phase = phase
+        self.profile = cProfile.Profile()
+        self.lock = threading.Lock()
+        self.spans = 0
+
+    @contextmanager
+    def __call__(self, phase, language, source):
+        if phase != self.phase or not self.lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            self.spans += 1
+            self.profile.enable()
+            try:
+                yield
+            finally:
+                self.profile.disable()
+        finally:
+            self.lock.release()
+
+    def dump(self, filepath):
+        """Write the profile in a file, to read with `pstats` or a viewer such as snakeviz."""
+        self.profile.dump_stats(str(filepath))
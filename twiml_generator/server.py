@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# coding: utf-8
+import json
+import logging
+import os
+import socketserver
+
+from contextlib import suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from lxml import etree
+
+from .emitter import LanguageSpecError
+from .fanout import generate_languages
+from .twiml_code_generator import LANGUAGES
+from .twimlir import TwimlIR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+WARM_UP_TWIML = '<?xml version="1.0" encoding="UTF-8"?>' \
+    '<Response><Gather><Say>Hello</Say></Gather></Response>'
+
+
+class BadRequest(Exception):
+    """Raised when a request to the server is malformed."""
+
+
+def check_twiml(twiml):
+    """Raise a BadRequest if an untrusted TwiML is malformed or declares a DOCTYPE.
+
+    It is parsed without resolving any entity nor accessing the network, and as a TwiML never
+    needs a DOCTYPE, rejecting it leaves no entity for the generation to resolve (XXE).
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    try:
+        tree = etree.parse(TwimlIR.get_xml_source(twiml), parser)
+    except etree.XMLSyntaxError as e:
+        raise BadRequest('Invalid TwiML: {}'.format(e))
+    if tree.docinfo.doctype:
+        raise BadRequest('A TwiML cannot declare a DOCTYPE')
+    if tree.getroot().tag != 'Response':
+        raise BadRequest('The root of a TwiML must be <Response>, not <{}>'.format(
+            tree.getroot().tag
+        ))
+
+
+def warm_up(languages=LANGUAGES):
+    """Generate a small TwiML in every language, to load the specs, XSD, formatters and caches."""
+    generate_languages(twiml=WARM_UP_TWIML, languages=languages)
+
+
+class GeneratorRequestHandler(BaseHTTPRequestHandler):
+    """Generate the code of the TwiML posted to `/generate`.
+
+    The body is either a JSON object
+    `{"twiml": ..., "languages": [...], "messaging": false, "format": true}` or the TwiML
+    itself (with an XML content type), the languages then being given by the `language`
+    query parameters. Every language is generated if none is given. The response is a JSON object
+    `{"code": {language: code}}`, or `{"error": message}` with a 4xx or 5xx status.
+    `GET /languages` returns the supported languages.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'TwimlGenerator'
+    # The response is buffered and sent in one go, not delayed by Nagle's algorithm
+    wbufsize = -1
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/languages':
+            self.send_json(200, {'languages': LANGUAGES})
+        else:
+            self.send_json(404, {'error': 'Not found: {}'.format(self.path)})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/generate':
+            self.discard_body()
+            self.send_json(404, {'error': 'Not found: {}'.format(self.path)})
+            return
+        try:
+            twiml, options = self.read_generate_request(parse_qs(url.query))
+            code = generate_languages(twiml=twiml, **options)
+        except (BadRequest, LanguageSpecError, etree.XMLSyntaxError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception('Cannot generate the code of %s', self.path)
+            self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+        else:
+            self.send_json(200, {'code': code})
+
+    def read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.close_connection = True
+            raise BadRequest('A Content-Length is needed')
+        if length > self.server.max_body_size:
+            self.close_connection = True
+            raise BadRequest('The body exceeds {} bytes'.format(self.server.max_body_size))
+        return self.rfile.read(length)
+
+    def discard_body(self):
+        with suppress(BadRequest):
+            self.read_body()
+
+    def read_generate_request(self, query):
+        """Return the TwiML and the generate_languages() options of a request."""
+        body = self.read_body()
+        if self.headers.get_content_type() in ('application/xml', 'text/xml'):
+            twiml, languages = body, query.get('language') or LANGUAGES
+            options = {'is_messaging': query.get('messaging', ['false'])[0] == 'true'}
+        else:
+            try:
+                request = json.loads(body.decode('utf-8'))
+            except ValueError as e:
+                raise BadRequest('Invalid JSON: {}'.format(e))
+            if not isinstance(request, dict) or not isinstance(request.get('twiml'), str):
+                raise BadRequest('Expected a JSON object with a "twiml" string')
+            twiml, languages = request['twiml'], request.get('languages') or LANGUAGES
+            options = {
+                'is_messaging': bool(request.get('messaging')),
+                'format': bool(request.get('format', True)),
+            }
+        if isinstance(languages, str):
+            languages = [languages]
+        if not isinstance(languages, (list, tuple)) or \
+                not all(isinstance(name, str) for name in languages):
+            raise BadRequest('Expected "languages" to be a list of strings')
+        unknown_languages = [language for language in languages if language not in LANGUAGES]
+        if unknown_languages:
+            raise BadRequest('Unknown languages {}, expected some of {}'.format(
+                ', '.join(unknown_languages), ', '.join(LANGUAGES)
+            ))
+        check_twiml(twiml)
+        options['languages'] = languages
+        return twiml, options
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # The client of a Unix socket has no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+
+class GeneratorHTTPServer(ThreadingHTTPServer):
+    """HTTP server generating code, on the loopback interface by default."""
+
+    daemon_threads = True
+    max_body_size = 16 * 1024 * 1024
+
+    def __init__(self, address=('127.0.0.1', 8000), handler_class=GeneratorRequestHandler):
+        super().__init__(address, handler_class)
+
+
+class GeneratorUnixServer(socketserver.ThreadingUnixStreamServer):
+    """HTTP server generating code on a Unix socket, e.g. for `curl --unix-socket`."""
+
+    daemon_threads = True
+    max_body_size = GeneratorHTTPServer.max_body_size
+
+    def __init__(self, socket_path, handler_class=GeneratorRequestHandler):
+        # A socket file left by a previous server prevents the binding
+        with suppress(FileNotFoundError):
+            os.unlink(socket_path)
+        super().__init__(socket_path, handler_class)
+
+    def server_close(self):
+        super().server_close()
+        with suppress(FileNotFoundError):
+            os.unlink(self.server_address)
+
+
+def serve(host='127.0.0.1', port=8000, unix_socket=None, languages=LANGUAGES):
+    """Warm up the generator for the languages, then serve requests until interrupted."""
+    warm_up(languages)
+    server = GeneratorUnixServer(unix_socket) if unix_socket else GeneratorHTTPServer((host, port))
+    logger.info('Serving on %s', unix_socket or 'http://{}:{}'.format(*server.server_address[:2]))
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -14,7 +14,18 @@ class Specificities:
     def __init__(self):
         self.__languages = [Java, CSharp, Node, PHP, Python, Ruby]
 
-    def clean(self, generator, language):
+    def get_language(self, language):
         for lang in self.__languages:
             if language == lang.__name__.lower():
-                lang.clean(generator)
+                return lang
+        return None
+
+    def clean(self, generator, language):
+        lang = self.get_language(language)
+        if lang:
+            lang.clean(generator)
+
+    def clean_verb(self, generator, language, verb):
+        lang = self.get_language(language)
+        if lang:
+            lang.clean_verb(verb, generator)
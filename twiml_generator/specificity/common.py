@@ -60,4 +60,10 @@ class Language:
 
     @classmethod
     def clean(cls, generator) -> None:
+        """Clean every verb of the generator TwiML IR"""
+        for verb, event in generator.twimlir:
+            cls.clean_verb(verb, generator)
+
+    @classmethod
+    def clean_verb(cls, verb, generator) -> None:
         raise NotImplementedError()
@@ -1,6 +1,6 @@
 from functools import partial
 
-from inflection import camelize, underscore
+from twiml_generator.inflections import camelize, underscore
 
 from twiml_generator.specificity.common import attr_to_list, to_bytes, \
     Language, rename_attr
@@ -61,15 +61,14 @@ class CSharp(Language):
     _classes = {}
 
     @classmethod
-    def clean(cls, generator) -> None:
+    def clean_verb(cls, verb, generator) -> None:
         """C# library specificities which requires to change the TwiML IR."""
-        for verb, event in generator.twimlir:
-            rename_attr(verb, 'for', 'for_')
+        rename_attr(verb, 'for', 'for_')
 
-            if verb.is_ssml:
-                verb.name = camelize(verb.name)
+        if verb.is_ssml:
+            verb.name = camelize(verb.name)
 
-            cls.verb_processing(verb, generator.specific_imports)
+        cls.verb_processing(verb, generator.specific_imports)
 
 
 @CSharp.register
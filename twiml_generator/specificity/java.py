@@ -1,6 +1,6 @@
 from functools import partial
 
-from inflection import underscore, camelize
+from twiml_generator.inflections import underscore, camelize
 
 from twiml_generator.specificity.common import attr_to_list, to_bytes, \
     rename_attr, Language
@@ -36,25 +36,23 @@ class Java(Language):
     _classes = {}
 
     @classmethod
-    def clean(cls, generator) -> None:
+    def clean_verb(cls, verb, generator) -> None:
         """Java library specificities which requires to change the TwiML IR."""
-
-        for verb, event in generator.twimlir:
-            if verb.is_ssml:
-                verb.variable_name = camelize(
-                    f'ssml_{verb.name}', uppercase_first_letter=False
-                )
-                verb.method_name = camelize(verb.name, uppercase_first_letter=False)
-                verb.name = camelize('ssml_' + verb.name)
-                import_name = f"import com.twilio.twiml.voice.{verb.name};"
-                generator.specific_imports.add(import_name)
-            if verb.name == 'Sip' and verb.parent.name == 'Refer':
-                verb.name = 'ReferSip'
-
-            cls.verb_processing(verb, generator.specific_imports)
-
-            rename_attr(verb, 'for', 'for_')
-            rename_attr(verb, 'break', 'break_')
+        if verb.is_ssml:
+            verb.variable_name = camelize(
+                f'ssml_{verb.name}', uppercase_first_letter=False
+            )
+            verb.method_name = camelize(verb.name, uppercase_first_letter=False)
+            verb.name = camelize('ssml_' + verb.name)
+            import_name = f"import com.twilio.twiml.voice.{verb.name};"
+            generator.specific_imports.add(import_name)
+        if verb.name == 'Sip' and verb.parent.name == 'Refer':
+            verb.name = 'ReferSip'
+
+        cls.verb_processing(verb, generator.specific_imports)
+
+        rename_attr(verb, 'for', 'for_')
+        rename_attr(verb, 'break', 'break_')
 
 
 @Java.register
@@ -5,12 +5,11 @@ class PHP(Language):
     _classes = {}
 
     @classmethod
-    def clean(cls, generator):
-        for verb, event in generator.twimlir:
-            if verb.name == 'break':
-                verb.name = 'break_'
+    def clean_verb(cls, verb, generator):
+        if verb.name == 'break':
+            verb.name = 'break_'
 
-            cls.verb_processing(verb, generator.specific_imports)
+        cls.verb_processing(verb, generator.specific_imports)
 
 
 class DefaultText:
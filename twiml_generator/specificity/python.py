@@ -1,4 +1,4 @@
-from inflection import camelize
+from twiml_generator.inflections import camelize
 
 from twiml_generator.specificity.common import Language, rename_attr, to_bytes
 
@@ -7,16 +7,15 @@ class Python(Language):
     _classes = {}
 
     @classmethod
-    def clean(cls, generator) -> None:
+    def clean_verb(cls, verb, generator) -> None:
         """Python library specificities which requires to change the TwiML IR.
         """
-        for verb, event in generator.twimlir:
-            if verb.name == 'break':
-                verb.name = 'break_'
-            rename_attr(verb, 'from', 'from_')
-            rename_attr(verb, 'for', 'for_')
+        if verb.name == 'break':
+            verb.name = 'break_'
+        rename_attr(verb, 'from', 'from_')
+        rename_attr(verb, 'for', 'for_')
 
-            cls.verb_processing(verb, generator.specific_imports)
+        cls.verb_processing(verb, generator.specific_imports)
 
     @classmethod
     def verb_processing(cls, verb, imports):
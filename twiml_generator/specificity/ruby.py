@@ -6,11 +6,9 @@ class Ruby(Language):
     _classes = {}
 
     @classmethod
-    def clean(cls, generator):
+    def clean_verb(cls, verb, generator):
         """Ruby library specificities which requires to change the TwiML IR."""
-
-        for verb, event in generator.twimlir:
-            cls.verb_processing(verb, generator.specific_imports)
+        cls.verb_processing(verb, generator.specific_imports)
 
 
 @Ruby.register
@@ -1,53 +1,144 @@
 #!/usr/bin/env python
 # coding: utf-8
+import io
 import json
 import logging
 import os
 import shutil
 import subprocess
+import tempfile
 
-from contextlib import suppress
+from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 from lxml import etree
-from inflection import underscore
-from inflection import camelize as pascalize
 
 from twiml_generator.specificity import Specificities
+from .comparison import compare_trees, etree_element_eq
+from .emitter import compile_language_spec
+from .formatting import FormattingError, format_code_string, format_files, get_in_process_formatter
+from .inflections import underscore
+from .inflections import camelize as pascalize
+from .instrumentation import timed
 from .twimlir import TwimlIR
 
-logging.basicConfig(level=logging.DEBUG)
-
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def camelize(string):
-    return pascalize(string, uppercase_first_letter=False)
+LANGUAGES = ('csharp', 'java', 'node', 'php', 'python', 'ruby')
 
+# Root directory of the project, where the helper libraries are installed
+PROJECT_DIRPATH = Path(__file__).resolve().parent.parent
 
-def load_language_spec(language):
-    """Load language specifications."""
+
+@lru_cache(maxsize=None)
+def read_language_spec(language):
+    """Read a language specifications file once per process."""
     spec_filepath = Path(__file__).parent / 'languages_specs' / (language + '.json')
-    logger.debug('Loading language spec file : {}'.format(spec_filepath))
+    logger.debug('Loading language spec file : %s', spec_filepath)
     with spec_filepath.open() as f:
         spec = json.load(f)
     return spec
 
 
+def load_language_spec(language):
+    """Load language specifications."""
+    return deepcopy(read_language_spec(language))
+
+
+@lru_cache(maxsize=None)
+def get_language_emitter(language):
+    """Compile a language specifications file once per process.
+
+    A LanguageSpecError is raised if the spec is malformed.
+    """
+    with timed('load', language):
+        return compile_language_spec(read_language_spec(language))
+
+
+class NameAllocator(object):
+    """Unique variable names of the verbs of a generation, suffixed with a counter (say, say2...).
+
+    Only a counter per base name is kept, not the names already given, so that the memory
+    does not grow with the number of verbs of a streamed TwiML.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.next_suffixes = {}
+
+    def get(self, verb):
+        return self.names.get(verb)
+
+    def is_taken(self, name):
+        """Return True if a name was already given, as a base name or a base name and a suffix."""
+        if name in self.next_suffixes:
+            return True
+        # Every suffix below the counter of a base name was given, to it or to another base name
+        for index in range(len(name) - 1, 0, -1):
+            if not name[index].isdigit():
+                break
+            suffix = int(name[index:])
+            if name[index] == '0' or suffix < 2:
+                continue
+            if self.next_suffixes.get(name[:index], 1) > suffix:
+                return True
+        return False
+
+    def allocate(self, verb, base_name):
+        """Return a new unique name for a verb, made from a base name."""
+        suffix = self.next_suffixes.get(base_name, 1)
+        name = base_name if suffix == 1 else base_name + str(suffix)
+        # Only another base name ending with digits can have taken the name already
+        while self.is_taken(name):
+            suffix += 1
+            name = base_name + str(suffix)
+        self.next_suffixes[base_name] = suffix + 1
+        self.names[verb] = name
+        return name
+
+    def release(self, verb):
+        """Forget the name of a verb that will not be output again, the name is not reused."""
+        self.names.pop(verb, None)
+
+
 class TwimlCodeGenerator(object):
     """Class to generate the necessary code for outputing a given TwiML."""
     __specificities = Specificities()
 
-    def __init__(self, twiml_filepath, code_filepath=None, lib_filepath=None, language='python', is_messaging=False):
-        self.language_spec = load_language_spec(language)
-        self.twiml_filepath = Path(twiml_filepath)
-        self.twimlir = TwimlIR(twiml_filepath)
-        if not code_filepath:
-            self.code_filepath = self.get_code_filepath()
-        elif not isinstance(code_filepath, Path):
-            self.code_filepath = Path(code_filepath)
+    def __init__(self, twiml_filepath=None, code_filepath=None, lib_filepath=None,
+                 language='python', is_messaging=False, twimlir=None, twiml=None, stream=False):
+        """Prepare the code generation of a TwiML file, or of a `twiml` str, bytes or stream.
+
+        An already parsed `twimlir` of the TwiML can be given to skip the parsing, the language
+        cleaning modifies a copy of it so it can be shared with other generators, even concurrently.
+        Nothing is written on disk until the code is written, the default `code_filepath`
+        is only computed (and its folder created) when it is first used.
+        With `stream`, the TwiML is parsed, cleaned and output incrementally (see iter_code()),
+        for very large TwiML files.
+        """
+        if twiml_filepath is None and twiml is None:
+            raise ValueError('A TwiML file path or a TwiML string is needed')
+        self.emitter = get_language_emitter(language)
+        self.language_spec = self.emitter.spec
+        if stream and self.emitter.reverse_build:
+            raise ValueError(
+                'The {} code cannot be streamed, it is built from the leaves'.format(language)
+            )
+        self.twiml_filepath = Path(twiml_filepath) if twiml_filepath is not None else None
+        if twimlir is not None:
+            self.twimlir = twimlir.copy()
+        elif twiml is not None:
+            if not stream and hasattr(twiml, 'read'):
+                # A stream can be read only once, but the TwiML is needed again for the verification
+                twiml = twiml.read()
+            self.twimlir = TwimlIR(self.twiml_filepath, xml=twiml, stream=stream)
+            twiml = self.twimlir.xml if stream else twiml
         else:
-            self.code_filepath = code_filepath
+            self.twimlir = TwimlIR(self.twiml_filepath, stream=stream)
+        self.twiml = twiml
+        self.code_filepath = code_filepath
 
         if is_messaging:
             self.twimlir.is_voice_response = False
@@ -55,32 +146,93 @@ class TwimlCodeGenerator(object):
         if lib_filepath:
             self.lib_filepath = Path(lib_filepath)
         else:
-            self.lib_filepath = Path(__file__).parent / '../lib'
+            self.lib_filepath = PROJECT_DIRPATH / 'lib'
         self.lib_filepath = self.lib_filepath.resolve()
 
         self.specific_imports = set()
-        self.__specificities.clean(self, language)
+        self.variable_names = NameAllocator()
+        # Differences between the TwiML and the output of the last verification
+        self.differences = []
+        # Computes each field of the verb templates
+        self.verb_fields = {
+            'variable': self.variable_for_verb,
+            'method': self.method_for_verb,
+            'parent': self.parent_variable_for_verb,
+            'attributes': self.join_attributes_for_verb,
+            'klass': self.class_for_verb,
+            'text': self.quote_text_for_verb,
+            'appends': self.join_appends,
+            'indent': self.indent_for_verb,
+        }
+        if not self.twimlir.is_streamed:
+            with timed('clean', language, self.twiml_filepath):
+                self.__specificities.clean(self, language)
 
     def overwrite_language_spec(self, key, value):
-        self.language_spec[key] = value
+        """Change a key of the language spec of this generator.
+
+        A LanguageSpecError is raised if the spec becomes malformed.
+        """
+        language_spec = dict(self.language_spec)
+        language_spec[key] = value
+        self.emitter = compile_language_spec(language_spec)
+        self.language_spec = self.emitter.spec
+
+    @property
+    def code_filepath(self):
+        """Path of the generator file to be written, by default computed from the TwiML path."""
+        if self._code_filepath is None:
+            self._code_filepath = self.get_code_filepath()
+        return self._code_filepath
+
+    @code_filepath.setter
+    def code_filepath(self, code_filepath):
+        self._code_filepath = Path(code_filepath) if code_filepath else None
 
     def get_code_filepath(self):
         """Return a path for the generator file to be written."""
+        if self.twiml_filepath is None:
+            raise ValueError('A code_filepath is needed to write the code of a TwiML string')
         filepath = self.twiml_filepath.resolve()
         generators_dirpath = filepath.parent.parent / 'generators'
         generators_dirpath.mkdir(exist_ok=True)
-        language_dirpath = generators_dirpath / self.language_spec['language']
+        language_dirpath = generators_dirpath / self.emitter.language
         language_dirpath.mkdir(exist_ok=True)
-        code_filepath = language_dirpath / filepath.name.replace('.xml', self.language_spec['extension'])
+        code_filepath = language_dirpath / filepath.name.replace('.xml', self.emitter.extension)
         return code_filepath
 
+    def read_twiml(self):
+        """Return the TwiML as bytes."""
+        if self.twiml is None:
+            return self.twiml_filepath.read_bytes()
+        elif isinstance(self.twiml, str):
+            return self.twiml.encode('utf-8')
+        elif hasattr(self.twiml, 'read'):
+            return self.twimlir.open_xml().read()
+        return bytes(self.twiml)
+
     def __repr__(self):
         """Return the code to generate the TwiML."""
-        if self.language_spec.get('reverse_build'):
-            return self.__reverse_repr__()
-
-        lines = []
+        with timed('emit', self.emitter.language, self.twiml_filepath):
+            if self.emitter.reverse_build:
+                return self.__reverse_repr__()
+            if self.twimlir.is_streamed:
+                return ''.join(self.iter_code())
+            return self.output_wrapper(list(self.iter_lines()))
+
+    def iter_verbs(self):
+        """Iterate over the IR like TwimlIR.__iter__, cleaning the verbs on the fly if streamed."""
+        if not self.twimlir.is_streamed:
+            yield from self.twimlir
+            return
         for verb, event in self.twimlir:
+            self.__specificities.clean_verb(self, self.emitter.language, verb)
+            yield verb, event
+
+    def iter_lines(self):
+        """Yield the lines of code building the TwiML, without the imports and the wrapper."""
+        for verb, event in self.iter_verbs():
+            lines = []
             if event == 'start':
                 lines.append(self.output_new_variable(verb))
             elif event == 'leaf':
@@ -91,11 +243,40 @@ class TwimlCodeGenerator(object):
                     lines.append(append_line)
             # Method for adding text after a closing tag
             # for example, append() in Python or addText() in node
-            if verb.tail and verb.tail.strip():
+            if event != 'start' and verb.tail and verb.tail.strip():
                 lines.append(self.output_new_text(verb))
-            if self.language_spec.get('optional_parentheses', False):
+            if lines and self.emitter.optional_parentheses:
                 lines[-1] = lines[-1].replace('()', '')
-        return self.output_wrapper(lines)
+            yield from lines
+            if event != 'start' and self.twimlir.is_streamed:
+                # The verbs of a streamed IR are not kept once output
+                self.variable_names.release(verb)
+
+    def iter_code(self):
+        """Yield the code piece by piece, the pieces joined being the same as str(self).
+
+        With a streamed IR, the TwiML is parsed twice, first to find the imports, then to output
+        the code lines as they are built, without keeping the IR in memory.
+        """
+        if not self.twimlir.is_streamed:
+            yield str(self)
+            return
+        # Every pass parses new verbs, which get the same names as in the previous passes
+        self.variable_names = NameAllocator()
+        # The imports depend on the verbs used and on their attributes
+        verb_names = set()
+        for verb, event in self.iter_verbs():
+            if not verb.is_ssml:
+                verb_names.add(verb.name)
+            self.build_attributes_for_verb(verb)
+
+        before_code, _, after_code = self.emitter.code_wrapper.format_string.partition('{code}')
+        wrapper_fields = self.get_wrapper_fields(self.output_imports(sorted(verb_names)))
+        yield before_code.format(**wrapper_fields)
+        padding = ' ' * self.emitter.code_wrapper_padding
+        for line in self.iter_lines():
+            yield padding + line + '\n'
+        yield after_code.format(**wrapper_fields)
 
     def __reverse_repr__(self):
         lines = []
@@ -106,143 +287,120 @@ class TwimlCodeGenerator(object):
                 lines.append(self.output_new_variable(verb))
         return self.output_wrapper(lines)
 
-    def output_imports(self):
-        """Return a string containing the imports lines for the code."""
+    def output_imports(self, verb_names=None):
+        """Return a string containing the imports lines for the code.
+
+        `verb_names` are the verbs used, the non-SSML verbs of the IR if None.
+        """
         if self.twimlir.is_voice_response:
             import_kind = 'import_voice'
         else:
             import_kind = 'import_messaging'
 
         # Remove import statements for SSML_VERBS, since they are generally methods in the Say class
-        imports = self.twimlir.get_verb_names(exclude_ssml_verbs=True)
+        if verb_names is not None:
+            imports = verb_names
+        else:
+            imports = self.twimlir.get_verb_names(exclude_ssml_verbs=True)
 
-        if self.language_spec.get('necessary_imports'):
-            imports.extend(self.language_spec['necessary_imports'])
+        if self.emitter.necessary_imports:
+            imports.extend(self.emitter.necessary_imports)
 
-        if self.language_spec.get('add_imports') == 'single_line':
+        import_template = getattr(self.emitter, import_kind)
+        if self.emitter.add_imports == 'single_line':
             imports = [verb if verb != 'Response' else self.class_for_verb_name(verb) for verb in imports]
-            return self.language_spec[import_kind].format(
+            return import_template(
                 imports=', '.join(imports)
             ) + '\n'
-        elif self.language_spec.get('add_imports') == 'multiple_lines':
+        elif self.emitter.add_imports == 'multiple_lines':
             classes_to_import = [verb if verb != 'Response' else self.class_for_verb_name(verb) for verb in imports]
             imports = []
             for class_name in classes_to_import:
-                if self.language_spec.get('import_common') \
-                   and class_name in self.language_spec.get('common_classes', []):
-                    imports.append(self.language_spec['import_common'].format(imports=class_name))
+                if self.emitter.import_common and class_name in self.emitter.common_classes:
+                    imports.append(self.emitter.import_common(imports=class_name))
                 else:
-                    imports.append(self.language_spec[import_kind].format(imports=class_name))
+                    imports.append(import_template(imports=class_name))
             imports = '\n'.join(imports) + '\n'
             if len(self.specific_imports) > 0:
-                imports += '\n'.join(self.specific_imports)
+                imports += '\n'.join(sorted(self.specific_imports))
             return imports
         else:
-            imports = self.language_spec[import_kind] + '\n'
+            imports = import_template.format_string + '\n'
             if self.specific_imports:
-                imports += '\n'.join(self.specific_imports)
+                imports += '\n'.join(sorted(self.specific_imports))
             return imports
 
-    def output_new_variable(self, verb, appends=None):
+    def render(self, template, verb, **values):
+        """Format a template for a verb, only computing the fields the template uses."""
+        verb_fields = self.verb_fields
+        for field in template.fields:
+            if field not in values:
+                values[field] = verb_fields[field](verb)
+        return template.format_string.format(**values)
+
+    def output_new_variable(self, verb):
         """Return a string to create a new tag that will contain other verbs."""
-        if verb.parent and self.language_spec.get('new_block'):
-            return self.language_spec['new_block'].format(
-                variable=self.variable_for_verb(verb),
-                method=self.method_for_verb(verb),
-                parent=self.variable_for_verb(verb.parent),
-                attributes=self.join_attributes_for_verb(verb),
-                klass=self.class_for_verb(verb),
-                text=self.quote_text_for_verb(verb),
-                appends=self.join_appends(verb),
-                indent=self.indent_for_verb(verb)
-            )
+        if verb.parent and self.emitter.new_block:
+            return self.render(self.emitter.new_block, verb)
         else:
-            return self.language_spec['new_variable'].format(
-                variable=self.variable_for_verb(verb),
-                klass=self.class_for_verb(verb),
-                attributes=self.join_attributes_for_verb(verb),
-                text=self.quote_text_for_verb(verb),
-                appends=self.join_appends(verb),
-                indent=self.indent_for_verb(verb)
-            )
+            return self.render(self.emitter.new_variable, verb)
 
     def output_new_leaf(self, verb):
         """Return a string for adding a simple verb to a parent."""
-        return self.language_spec['new_leaf'].format(
-            parent=self.variable_for_verb(verb.parent),
-            method=self.method_for_verb(verb),
-            text=self.quote_text_for_verb(verb),
-            attributes=self.join_attributes_for_verb(verb),
-            klass=self.class_for_verb(verb),
-            variable=self.variable_for_verb(verb),
-            indent=self.indent_for_verb(verb)
-        )
+        return self.render(self.emitter.new_leaf, verb)
 
     def output_new_text(self, verb):
         """Return the method that outputs text outside XML tags."""
-        return self.language_spec['new_text'].format(
-            parent=self.variable_for_verb(verb.parent),
-            text=verb.tail.strip(),
-            indent=self.indent_for_verb(verb)
-        )
+        return self.render(self.emitter.new_text, verb, text=verb.tail.strip())
 
     def output_append(self, verb):
         """Return a string to append a verb to its parent."""
-        return self.language_spec['append'].format(
-            parent=self.variable_for_verb(verb.parent),
-            klass=self.class_for_verb(verb),
-            variable=self.variable_for_verb(verb),
-            indent=self.indent_for_verb(verb)
-        )
+        return self.render(self.emitter.append, verb)
 
     def output_print(self):
         """Return a string to print the TwiML result in the code."""
-        return self.language_spec['print']
+        return self.emitter.print
 
     def output_wrapper(self, lines):
         """Used to wrap code, structure imports and print out function in a single file."""
-        return self.language_spec['code_wrapper'].format(
-            imports=self.output_imports(),
-            classname=pascalize(underscore(str(self.twiml_filepath.name)[:-4])),
+        return self.emitter.code_wrapper(
             code=self.output_padded_code(lines),
-            print=self.output_padded_code(self.output_print().split('\n'))
+            **self.get_wrapper_fields(self.output_imports())
         )
 
+    def get_wrapper_fields(self, imports):
+        """Return the fields of the code wrapper other than the code."""
+        return {
+            'imports': imports,
+            'classname': pascalize(underscore(
+                self.twiml_filepath.name[:-4] if self.twiml_filepath else 'example'
+            )),
+            'print': self.output_padded_code(self.output_print().split('\n')),
+        }
+
     def output_padded_code(self, lines):
         """Return a string containing all the lines left padded accordingly."""
-        return '\n'.join([' ' * self.language_spec['code_wrapper_padding'] + line for line in lines]) + '\n'
+        return '\n'.join([' ' * self.emitter.code_wrapper_padding + line for line in lines]) + '\n'
 
     def variable_for_verb(self, verb):
         """Return a formated variable name for a given verb."""
         if not verb:
             return ''
-        elif not verb.variable_name:
-            if self.language_spec.get('variable_name_style') == 'camelize':
-                variable_name = camelize(verb.name)
-            elif self.language_spec.get('variable_name_style') == 'pascalize':
-                variable_name = pascalize(verb.name)
-            else:
-                variable_name = verb.name.lower()
-            number = 1
-            verb.variable_name = variable_name
-            while verb.variable_name in self.twimlir.generated_variables_names:
-                number += 1
-                verb.variable_name = variable_name + str(number)
-            self.twimlir.generated_variables_names.add(verb.variable_name)
-        return verb.variable_name
+        variable_name = self.variable_names.get(verb)
+        if variable_name is None:
+            # A name set by the language cleaning is preferred, but must be unique as well
+            variable_name = self.variable_names.allocate(
+                verb, verb.variable_name or self.emitter.variable_name(verb.name)
+            )
+        return variable_name
+
+    def parent_variable_for_verb(self, verb):
+        """Return the variable name of the parent of a verb."""
+        return self.variable_for_verb(verb.parent)
 
     def method_for_verb(self, verb):
-        method_name = getattr(verb, 'method_name', verb.name)
         """Return a formated method name for a given verb."""
-        if self.language_spec.get('method_name_style') == 'camelize':
-            method_name = camelize(method_name)
-        elif self.language_spec.get('method_name_style') == 'pascalize':
-            method_name = pascalize(method_name)
-        elif self.language_spec.get('method_name_style') == 'underscore':
-            method_name = underscore(method_name)
-        else:
-            method_name = method_name.lower()
-        return method_name
+        return self.emitter.method_name(verb.method_name or verb.name)
 
     def class_for_verb(self, verb):
         """Return a formated class name for a given verb."""
@@ -253,11 +411,11 @@ class TwimlCodeGenerator(object):
         verb_name = pascalize(verb_name)
         if verb_name == 'Response':
             if self.twimlir.is_voice_response:
-                return self.language_spec['voice_class']
+                return self.emitter.voice_class
             else:
-                return self.language_spec['messaging_class']
-        elif 'new_klass' in self.language_spec:
-            return self.language_spec['new_klass'].format(klass=verb_name)
+                return self.emitter.messaging_class
+        elif self.emitter.new_klass:
+            return self.emitter.new_klass(klass=verb_name)
         else:
             return verb_name
 
@@ -269,8 +427,8 @@ class TwimlCodeGenerator(object):
             return verb.text.decode('utf-8')
         if verb.text == ' ':
             verb.text = ''
-        quote = self.language_spec.get('string_quote', "'")
-        text = self.language_spec['text_format'].format(
+        quote = self.emitter.string_quote or "'"
+        text = self.emitter.text_format(
             text=quote + verb.text.replace(quote, '\\' + quote) + quote
         )
         if len(verb.attributes) == 0:
@@ -284,57 +442,55 @@ class TwimlCodeGenerator(object):
         """Return a string containing the attributes to be used when calling the verb method."""
         if len(verb.attributes) > 0:
             attributes = self.build_attributes_for_verb(verb)
-            joined_attributes = self.language_spec.get('attribute_join', ', ').join(attributes)
-            return self.language_spec.get('attributes_wrapper_format', '{attributes}') \
-                                     .format(attributes=joined_attributes)
+            joined_attributes = self.emitter.attribute_join.join(attributes)
+            if self.emitter.attributes_wrapper_format:
+                return self.emitter.attributes_wrapper_format(attributes=joined_attributes)
+            return joined_attributes
         else:
             return ''
 
     def build_attributes_for_verb(self, verb):
         """Return a list of attributes declaration formated for the language to be joined."""
+        emitter = self.emitter
         built_attributes = []
         for name, value in verb.attributes.items():
-            if self.language_spec.get('attribute_name_style') == 'underscore':
-                name = underscore(name)
-            elif self.language_spec.get('attribute_name_style') == 'camelize':
-                name = camelize(underscore(name))
-            if self.language_spec.get('attributes_map') \
-               and self.language_spec['attributes_map'].get(name) \
-               and self.language_spec['attributes_map'][name].get(value):
-                value = self.language_spec['attributes_map'][name][value]
-                if self.language_spec['attributes_map'][name].get('_import'):
-                    self.specific_imports.add(self.language_spec['attributes_map'][name]['_import'])
-            elif self.language_spec.get('use_boolean') and value in ['true', 'false']:
+            name = emitter.attribute_name(name)
+            attribute_map = emitter.attributes_map.get(name)
+            if attribute_map and attribute_map.get(value):
+                value = attribute_map[value]
+                if attribute_map.get('_import'):
+                    self.specific_imports.add(attribute_map['_import'])
+            elif emitter.use_boolean and value in ['true', 'false']:
                 value = value
-            elif isinstance(value, str) and self.language_spec.get('string_quote'):
-                quote = self.language_spec['string_quote']
+            elif isinstance(value, str) and emitter.string_quote:
+                quote = emitter.string_quote
                 value = quote + value + quote
             elif isinstance(value, bytes):
                 value = value.decode('utf-8')
             else:
                 value = repr(value)
             # The Node interpret-as parameter needs to be surrounded by quotes, since it uses a dash
-            if self.language_spec.get('language') == 'node' and name == 'interpretAs':
+            if emitter.language == 'node' and name == 'interpretAs':
                 name = "'interpret-as'"
 
-            built_attributes.append(self.language_spec['attribute_format'].format(name=name, value=value))
+            built_attributes.append(emitter.attribute_format(name=name, value=value))
         return built_attributes
 
     def indent_for_verb(self, verb):
-        return '    ' * (verb.depth + self.language_spec.get('depth_padding', 0))
+        return '    ' * (verb.depth + self.emitter.depth_padding)
 
     def join_appends(self, verb):
         """Return a string with all the leaves to be appened to the current verb."""
-        if self.language_spec.get('chained_append'):
+        if self.emitter.chained_append:
             chain = []
             for v in verb.children:
-                chain.append(self.language_spec['chained_append'].format(
+                chain.append(self.emitter.chained_append(
                     method=self.method_for_verb(v),
                     variable=self.variable_for_verb(v)
                 ))
                 # Chained addText() method
                 if v.tail and v.tail.strip():
-                    if self.language_spec['language'] == 'java':
+                    if self.emitter.language == 'java':
                         # In Java every method is chained, so we need to drop the parent
                         # E.g. ssmlP(p).addText("aaaaaa").ssmlPhoneme(phoneme).addText("bbbbbbb")
                         v.parent = ''
@@ -343,40 +499,111 @@ class TwimlCodeGenerator(object):
         else:
             return ''
 
-    def write_code(self):
-        """Write the code in the generator file."""
+    def generate_code(self, format=True):
+        """Return the generated code without touching the filesystem.
+
+        The code is formatted if its formatter is available as a library (and `format` is True),
+        a FormattingError is raised if it cannot be formatted.
+        """
+        code = str(self)
+        if format and self.has_in_process_formatter:
+            with timed('format', self.emitter.language, self.twiml_filepath):
+                code = format_code_string(code, self.emitter.formatter)
+        return code
+
+    def write_code(self, format=True):
+        """Write the code in the generator file.
+
+        The code is formatted in-process if its formatter is available as a library,
+        otherwise the formatter command runs on the written file. Nothing is formatted if
+        `format` is False, e.g. to run the formatter command on many files at once with
+        `formatting.format_files` (passing `format=self.has_in_process_formatter`).
+        A FormattingError is raised if the code cannot be formatted, after writing it unformatted.
+        The code of a streamed IR is written as it is output, then formatted by the formatter
+        command.
+        """
+        if self.twimlir.is_streamed:
+            if self.code_filepath.exists():
+                self.code_filepath.unlink()
+            # The parsing and the cleaning are interleaved with the emission, like in str(self)
+            with timed('emit', self.emitter.language, self.twiml_filepath), \
+                    self.code_filepath.open('w', encoding='utf-8') as f:
+                f.writelines(self.iter_code())
+            if format and self.emitter.formatter:
+                with timed('format', self.emitter.language, self.twiml_filepath):
+                    format_files(self.emitter.formatter, [self.code_filepath])
+            return
+
+        code = str(self)
+        formatting_error = None
+        if format and self.has_in_process_formatter:
+            try:
+                with timed('format', self.emitter.language, self.twiml_filepath):
+                    code = format_code_string(code, self.emitter.formatter)
+            except FormattingError as e:
+                formatting_error = e
         if self.code_filepath.exists():
             self.code_filepath.unlink()
-        self.code_filepath.write_text(str(self), encoding='utf-8')
-        self.format_code()
+        self.code_filepath.write_text(code, encoding='utf-8')
+        if formatting_error:
+            raise formatting_error
+        if format:
+            self.format_code()
+
+    @property
+    def has_in_process_formatter(self):
+        """True if the code can be formatted without running the formatter command."""
+        return get_in_process_formatter(self.emitter.formatter) is not None
 
     def format_code(self):
-        if 'formatter' not in self.language_spec:
+        """Run the formatter command on the written code, if not formatted in-process."""
+        if not self.emitter.formatter or self.has_in_process_formatter:
             return
-        format_cmd = self.language_spec['formatter'].format(filepath=str(self.code_filepath))
-        subprocess.run([format_cmd], shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with timed('format', self.emitter.language, self.twiml_filepath):
+            format_files(self.emitter.formatter, [self.code_filepath])
 
     # Constants for verify result
     VERIFY_SUCCESS = 0
     VERIFY_FAILURE = 1
     VERIFY_COMPILE_ERROR = 2
 
-    def verify(self):
-        """Try to run the code and verify its output against the original TwiML."""
-        parser = etree.XMLParser(remove_blank_text=True, remove_comments=True, strip_cdata=True)
-        if self.language_spec['language'] == 'java':
-            p = self.verify_java()
-        elif self.language_spec['language'] == 'csharp':
-            p = self.verify_csharp()
-        else:
-            p = self.verify_generic()
+    def verify(self, runner=None, cache=None):
+        """Try to run the code and verify its output against the original TwiML.
+
+        The code is run by `runner.run(self)` if a runner (e.g. an InterpreterHarness) is given.
+        If a VerificationCache is given, the code is not run again if its result is cached.
+        """
+        if cache is not None:
+            cached_result = cache.get(self)
+            if cached_result is not None:
+                self.restore_differences(cached_result)
+                return cached_result
+
+        with timed('verify', self.emitter.language, self.twiml_filepath):
+            if runner is not None:
+                p = runner.run(self)
+            else:
+                p = self.run_commands(self.verification_commands())
+            result = self.verify_process(p)
+
+        if cache is not None:
+            cache.put(self, result)
+        return result
 
+    def verify_process(self, p):
+        """Verify the result of a process that ran the code against the original TwiML."""
+        parser = etree.XMLParser(remove_blank_text=True, remove_comments=True, strip_cdata=True)
+        self.differences = []
         if p.returncode == 0:
-            input_tree = etree.parse(str(self.twiml_filepath), parser)
+            input_tree = etree.parse(io.BytesIO(self.read_twiml()), parser)
             output_tree = etree.fromstring(p.stdout, parser)
-            comparison_result = self.etree_element_eq(input_tree.getroot(), output_tree)
+            self.differences = compare_trees(input_tree.getroot(), output_tree)
+            if self.differences:
+                result = TwimlCodeGenerator.VERIFY_FAILURE
+            else:
+                result = TwimlCodeGenerator.VERIFY_SUCCESS
             return (
-                TwimlCodeGenerator.VERIFY_SUCCESS if comparison_result else TwimlCodeGenerator.VERIFY_FAILURE,
+                result,
                 '\n'.join([p.stdout.decode(), p.stderr.decode()]),
                 etree.tostring(input_tree, encoding='utf-8', pretty_print=True).decode(),
                 etree.tostring(output_tree, encoding='utf-8', pretty_print=True).decode()
@@ -389,100 +616,104 @@ class TwimlCodeGenerator(object):
                 None
             )
 
+    def restore_differences(self, verify_result):
+        """Compute the differences of a cached verify() result, from its input and output trees."""
+        self.differences = []
+        if verify_result[0] == TwimlCodeGenerator.VERIFY_FAILURE:
+            parser = etree.XMLParser(remove_blank_text=True)
+            input_tree = etree.fromstring(verify_result[2].encode('utf-8'), parser)
+            output_tree = etree.fromstring(verify_result[3].encode('utf-8'), parser)
+            self.differences = compare_trees(input_tree, output_tree)
+
+    def verification_commands(self):
+        """Return a generator of the commands running the code, for `run_commands`."""
+        if self.emitter.language == 'java':
+            return self.java_commands()
+        elif self.emitter.language == 'csharp':
+            return self.csharp_commands()
+        return self.generic_commands()
+
+    @staticmethod
+    def run_commands(commands):
+        """Run the commands of a generator such as `java_commands`, returning the last process.
+
+        The generator yields a (command, cwd) tuple per command, receives its CompletedProcess
+        and returns the process to verify. The generator is closed (e.g. removing its workspace)
+        even if a command cannot be run or the run is interrupted.
+        """
+        p = None
+        try:
+            while True:
+                command, cwd = commands.send(p)
+                logger.debug('Running: %s', ' '.join(command))
+                p = subprocess.run(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except StopIteration as e:
+            return e.value
+        finally:
+            commands.close()
+
     def verify_generic(self):
-        generic_command = [self.language_spec['language'], str(self.code_filepath)]
-        logger.debug('Running: {}'.format(' '.join(generic_command)))
-        return subprocess.run(generic_command,
-                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return self.run_commands(self.generic_commands())
 
     def verify_java(self):
-        if not shutil.which('java'):
-            raise Exception('You need to install java if you want to verify a java file')
+        return self.run_commands(self.java_commands())
 
-        example_filepath = Path('Example.java')
-        class_filepath = Path('Example.class')
-        jar_filepath = self.lib_filepath / '*'
+    def verify_csharp(self):
+        return self.run_commands(self.csharp_commands())
 
-        def java_cleanup():
-            try:
-                example_filepath.unlink()
-                class_filepath.unlink()
-            except OSError:
-                pass
+    def generic_commands(self):
+        return (yield [self.emitter.language, str(self.code_filepath)], None)
 
-        javac_command = ['javac', '-cp', str(jar_filepath), 'Example.java']
-        java_command = ['java', '-cp', str(jar_filepath) + ':', 'Example']
+    def java_commands(self):
+        if not shutil.which('java'):
+            raise Exception('You need to install java if you want to verify a java file')
 
-        shutil.copy(str(self.code_filepath), str(example_filepath))
+        # Every job compiles and runs its own copy of the code in a private temporary
+        # directory, removed even if the job is interrupted
+        with tempfile.TemporaryDirectory(prefix='twiml-java-') as workspace:
+            classpath = os.pathsep.join([str(self.lib_filepath / '*'), workspace])
+            javac_command = ['javac', '-cp', classpath, '-d', workspace, 'Example.java']
+            java_command = ['java', '-cp', classpath, 'Example']
 
-        logger.debug('Running : {}'.format(' '.join(javac_command)))
-        p = subprocess.run(javac_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if p.returncode != 0:
-            java_cleanup()
-            return p
+            shutil.copy(str(self.code_filepath), str(Path(workspace) / 'Example.java'))
 
-        logger.debug('Running : {}'.format(' '.join(java_command)))
-        p = subprocess.run(java_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        java_cleanup()
-        return p
+            p = yield javac_command, workspace
+            if p.returncode != 0:
+                return p
 
-    def verify_csharp(self):
+            return (yield java_command, workspace)
+
+    def csharp_commands(self):
         if not shutil.which('dotnet'):
             raise Exception('You need to install dotnet core if you want to verify a C# file')
 
-        is_new_env = False
-        cwd = Path.cwd()
-        absolute_code_filepath = self.code_filepath.resolve()
-        project_filepath = Path('dotnet_env')
-        if not project_filepath.exists():
-            project_filepath.mkdir()
-            is_new_env = True
-        os.chdir(project_filepath)
-
-        def csharp_clean():
-            try:
-                os.chdir(cwd)
-            except OSError:
-                pass
+        project_filepath = PROJECT_DIRPATH / 'dotnet_env'
 
         dotnet_new_command = ['dotnet', 'new', 'console']
         dotnet_add_package_command = ['dotnet', 'add', 'package', 'Twilio']
         dotnet_run_command = ['dotnet', 'run']
 
-        if is_new_env:
-            logger.debug('Running: {}'.format(' '.join(dotnet_new_command)))
-            p = subprocess.run(dotnet_new_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if p.returncode != 0:
-                csharp_clean()
-                return p
-
-            logger.debug('Running: {}'.format(' '.join(dotnet_add_package_command)))
-            p = subprocess.run(dotnet_add_package_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if p.returncode != 0:
-                csharp_clean()
-                return p
-
-        program_path = Path('Program.cs')
-        with suppress(FileNotFoundError):
-            program_path.unlink()
-        program_path.symlink_to(absolute_code_filepath)
-
-        logger.debug('Running: {}'.format(' '.join(dotnet_run_command)))
-        p = subprocess.run(dotnet_run_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        csharp_clean()
-        return p
+        # The project referencing the Twilio package is created once, the commands run inside
+        # it rather than changing the process-wide cwd
+        if not list(project_filepath.glob('*.csproj')):
+            project_filepath.mkdir(parents=True, exist_ok=True)
+            for command in (dotnet_new_command, dotnet_add_package_command):
+                p = yield command, str(project_filepath)
+                if p.returncode != 0:
+                    # A partial project would make the next `dotnet new` fail
+                    shutil.rmtree(str(project_filepath), ignore_errors=True)
+                    return p
+            (project_filepath / 'Program.cs').unlink()
+
+        # Every job runs its own copy of the project and of the code in a private temporary
+        # directory, the package being restored from the local cache
+        with tempfile.TemporaryDirectory(prefix='twiml-csharp-') as workspace:
+            for csproj_filepath in project_filepath.glob('*.csproj'):
+                shutil.copy(str(csproj_filepath), workspace)
+            shutil.copy(str(self.code_filepath), str(Path(workspace) / 'Program.cs'))
+
+            return (yield dotnet_run_command, workspace)
 
     def etree_element_eq(self, a, b):
         """Return True if two etree (a and b) are equal."""
-        return (
-            a.tag == b.tag
-            and a.attrib == b.attrib
-            and (
-                TwimlIR.clean_text(a.tail) == TwimlIR.clean_text(b.tail)
-            )
-            and (
-                TwimlIR.clean_text(a.text) == TwimlIR.clean_text(b.text)
-            )
-            and len(a) == len(b)
-            and all(self.etree_element_eq(c1, c2) for c1, c2 in zip(a, b))
-        )
+        return etree_element_eq(a, b)
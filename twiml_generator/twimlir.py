@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 # coding: utf-8
+import copy
+import io
+import itertools
+import json
 import logging
+import sys
+import threading
 
 from lxml import etree
 from pathlib import Path
+from types import MappingProxyType
 
-logging.basicConfig(level=logging.DEBUG)
+from .instrumentation import timed
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -14,12 +21,23 @@ logger.setLevel(logging.INFO)
 class TwimlAttributesTypes(dict):
     """Class to handle attributes for TwiML verbs."""
 
-    def __init__(self, xsd_filepath=None):
-        """Construct an object to handle TwiML attributes types."""
+    # Process-wide read-only tables, keyed by (XSD path, XSD mtime)
+    _shared_tables = {}
+    _shared_tables_lock = threading.Lock()
+
+    def __init__(self, xsd_filepath=None, attributes_types=None):
+        """Construct an object to handle TwiML attributes types.
+
+        If `attributes_types` is given, it is used as is instead of parsing the XSD.
+        """
         self.xsd_filepath = self.get_xsd_filepath(xsd_filepath)
-        self.build_attributes_types()
+        if attributes_types is None:
+            self.build_attributes_types()
+        else:
+            self.update(attributes_types)
 
-    def get_xsd_filepath(self, xsd_filepath):
+    @staticmethod
+    def get_xsd_filepath(xsd_filepath):
         """Return the path to the XSD file cast as a Path instance."""
         if isinstance(xsd_filepath, Path):
             return xsd_filepath
@@ -28,6 +46,11 @@ class TwimlAttributesTypes(dict):
         else:
             return Path(xsd_filepath)
 
+    @staticmethod
+    def get_precompiled_filepath(xsd_filepath):
+        """Return the path of the JSON sidecar holding the precompiled attributes types."""
+        return xsd_filepath.with_name(xsd_filepath.name + '.json')
+
     def build_attributes_types(self):
         """Fill a dict of expect types for TwiML attributes."""
         tree = etree.parse(str(self.xsd_filepath))
@@ -40,19 +63,87 @@ class TwimlAttributesTypes(dict):
                 attributes_types[attribute.attrib['name']] = attribute.attrib['type']
             self[complexTypeName] = attributes_types
 
+    @classmethod
+    def shared(cls, xsd_filepath=None, use_precompiled=True):
+        """Return the process-wide, read-only attributes types table for a XSD file.
+
+        The table is built once per XSD path and modification time, from the
+        precompiled sidecar when it is up to date or from the XSD otherwise.
+        """
+        xsd_filepath = cls.get_xsd_filepath(xsd_filepath).resolve()
+        key = (str(xsd_filepath), xsd_filepath.stat().st_mtime_ns)
+        with cls._shared_tables_lock:
+            if key not in cls._shared_tables:
+                attributes_types = use_precompiled and cls.load_precompiled(xsd_filepath)
+                if not attributes_types:
+                    attributes_types = cls(xsd_filepath)
+                # Drop the tables built for previous versions of this XSD
+                for stale_key in [k for k in cls._shared_tables if k[0] == key[0]]:
+                    del cls._shared_tables[stale_key]
+                cls._shared_tables[key] = MappingProxyType({
+                    name: MappingProxyType(types) for name, types in attributes_types.items()
+                })
+            return cls._shared_tables[key]
+
+    @classmethod
+    def load_precompiled(cls, xsd_filepath=None):
+        """Return the attributes types from the JSON sidecar, None if missing or outdated."""
+        xsd_filepath = cls.get_xsd_filepath(xsd_filepath)
+        precompiled_filepath = cls.get_precompiled_filepath(xsd_filepath)
+        try:
+            with precompiled_filepath.open(encoding='utf-8') as f:
+                precompiled = json.load(f)
+            if precompiled['xsd_mtime_ns'] != xsd_filepath.stat().st_mtime_ns:
+                logger.debug('Outdated precompiled attributes types: %s', precompiled_filepath)
+                return None
+            return cls(xsd_filepath, attributes_types=precompiled['attributes_types'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def precompile(cls, xsd_filepath=None):
+        """Parse the XSD and write its attributes types in a JSON sidecar next to it."""
+        attributes_types = cls(xsd_filepath)
+        precompiled_filepath = cls.get_precompiled_filepath(attributes_types.xsd_filepath)
+        precompiled_filepath.write_text(json.dumps({
+            'xsd_mtime_ns': attributes_types.xsd_filepath.stat().st_mtime_ns,
+            'attributes_types': attributes_types,
+        }, indent=2, sort_keys=True), encoding='utf-8')
+        return precompiled_filepath
+
 
 class TwimlIR(object):
     """Internal Representation of a TwiML."""
 
-    def __init__(self, xml_filepath=None):
-        self.xml_filepath = self.__class__.get_xml_filepath(xml_filepath)
-        self.twiml_attributes_types = TwimlAttributesTypes()
+    def __init__(self, xml_filepath=None, xml=None, stream=False):
+        """Parse a TwiML file, or the `xml` TwiML given as str, bytes or a binary file-like object.
+
+        With `stream`, the TwiML is not parsed up front: every iteration over the IR parses it
+        again incrementally, so that the whole IR is never kept in memory.
+        """
+        if xml is None or xml_filepath:
+            self.xml_filepath = self.__class__.get_xml_filepath(xml_filepath)
+        else:
+            self.xml_filepath = None
+        self.twiml_attributes_types = TwimlAttributesTypes.shared()
         self.response = None
         self.is_voice_response = True
-        self.generated_variables_names = set()
-
-        logger.debug('Parsing XML: {}'.format(self.xml_filepath))
-        self.parse_xml()
+        self.is_streamed = stream
+
+        self.xml = xml
+        self.xml_position = 0
+        if stream and hasattr(xml, 'read'):
+            if hasattr(xml, 'seekable') and xml.seekable():
+                self.xml_position = xml.tell()
+            else:
+                # The TwiML is parsed on every iteration, so it must be read again
+                self.xml = xml.read()
+
+        if not stream:
+            logger.debug('Parsing XML: %s', self.xml_filepath or '<string>')
+            with timed('parse', source=self.xml_filepath):
+                self.parse_xml(xml)
+            self.xml = None
 
     @staticmethod
     def get_xml_filepath(xml_filepath):
@@ -64,44 +155,107 @@ class TwimlIR(object):
         else:
             return Path(xml_filepath)
 
+    def copy(self):
+        """Return a copy of the IR whose verbs can be modified without altering this one."""
+        twimlir = copy.copy(self)
+        twimlir.response = self.response.copy() if self.response else None
+        return twimlir
+
     @property
     def is_messaging_response(self):
         """True if the TwiML is for Messaging."""
         return not self.is_voice_response
 
-    def parse_xml(self):
-        """Parse the TwiML file and create the internal representation."""
+    @staticmethod
+    def get_xml_source(xml):
+        """Return a source for lxml to parse a TwiML str, bytes or binary file-like object."""
+        if isinstance(xml, str):
+            return io.BytesIO(xml.encode('utf-8'))
+        elif isinstance(xml, (bytes, bytearray)):
+            return io.BytesIO(xml)
+        return xml
+
+    def open_xml(self):
+        """Return a source for lxml to parse the TwiML of a streamed IR from its start."""
+        if self.xml is None:
+            return str(self.xml_filepath)
+        if hasattr(self.xml, 'seek'):
+            self.xml.seek(self.xml_position)
+        return self.get_xml_source(self.xml)
+
+    def parse_xml(self, xml=None):
+        """Parse the TwiML (the file if `xml` is not given) and create the IR."""
+        source = str(self.xml_filepath) if xml is None else self.get_xml_source(xml)
+        for verb, event in self.iter_parse(source):
+            if event == 'end':
+                continue
+            if verb.name == 'Response':
+                self.response = verb
+            else:
+                verb.parent.children.append(verb)
+
+    def iter_parse(self, source):
+        """Parse the TwiML incrementally, yielding its verbs and events like iterating over the IR.
+
+        Verbs are not added to the children of their parent, and the parsed elements are cleared
+        as the parsing goes, so the memory used does not depend on the length of the TwiML.
+        """
+        # lxml may not have parsed the text and the tail of an element yet when returning
+        # its events, so an event is only handled once the next one is known
+        # Checked once, as the debug logs of every element would slow the parsing down
+        debug = logger.isEnabledFor(logging.DEBUG)
         latest_verb = None
-        processing_ssml = False
-        for event, twiml_verb in etree.iterparse(str(self.xml_filepath), events=("start", "end")):
+        leaf_verb = None
+        events = etree.iterparse(source, events=('start', 'end'))
+        event, twiml_verb = next(events)
+        if twiml_verb.tag != 'Response':
+            raise ValueError('The root of a TwiML must be <Response>, not <{}>'.format(
+                twiml_verb.tag
+            ))
+        for next_event, next_twiml_verb in itertools.chain(events, [(None, None)]):
             if event == 'start':
-                logger.debug('Start event on verb : {}'.format(twiml_verb.tag))
+                if debug:
+                    logger.debug('Start event on verb : %s', twiml_verb.tag)
                 verb = TwimlIRVerb(
                     name=twiml_verb.tag,
                     attributes=self.clean_attributes(twiml_verb.tag, twiml_verb.attrib),
                     text=self.clean_text(twiml_verb.text),
                     parent=latest_verb,
-                    tail=twiml_verb.tail,
-                    is_ssml=processing_ssml
+                    tail=None,
+                    # SSML verbs are the ones nested in a Say verb
+                    is_ssml=latest_verb is not None and (
+                        latest_verb.is_ssml or latest_verb.name == 'Say'
+                    )
                 )
-                if twiml_verb.tag == 'Say' and len(list(twiml_verb)) > 0:
-                    processing_ssml = True
                 if twiml_verb.tag == 'Message':
                     self.is_voice_response = False
-                if twiml_verb.tag == 'Response':
-                    self.response = verb
+                is_empty = next_event == 'end' and next_twiml_verb is twiml_verb
+                # The Response is never a leaf, even if empty, like in the tree of the IR
+                if is_empty and latest_verb is not None:
+                    leaf_verb = verb
                 else:
-                    latest_verb.children.append(verb)
-                latest_verb = verb
-                logger.debug('Set Latest Verb Seen as : {}'.format(latest_verb.name))
+                    latest_verb = verb
+                    yield verb, 'start'
 
             elif event == 'end':
-                logger.debug('End event on verb : {}'.format(twiml_verb.tag))
-                latest_verb = latest_verb.parent
-                if latest_verb:
-                    logger.debug('Set Latest Verb Seen as : {}'.format(latest_verb.name))
-                if twiml_verb.tag == 'Say' and len(list(twiml_verb)) > 0:
-                    processing_ssml = False
+                if debug:
+                    logger.debug('End event on verb : %s', twiml_verb.tag)
+                if leaf_verb is not None:
+                    verb, leaf_verb = leaf_verb, None
+                    verb.tail = twiml_verb.tail
+                    yield verb, 'leaf'
+                else:
+                    verb, latest_verb = latest_verb, latest_verb.parent
+                    verb.tail = twiml_verb.tail
+                    yield verb, 'end'
+                # Free the element and its previous siblings, which have all been handled
+                twiml_verb.clear()
+                parent = twiml_verb.getparent()
+                if parent is not None:
+                    while twiml_verb.getprevious() is not None:
+                        del parent[0]
+
+            event, twiml_verb = next_event, next_twiml_verb
 
     @staticmethod
     def clean_text(text):
@@ -127,10 +281,12 @@ class TwimlIR(object):
 
     def __iter__(self):
         """Iterator to traverse the TwiML IR with a DFS."""
-        visited, queue = set(), [(self.response, 'start')]
+        if self.is_streamed:
+            yield from self.iter_parse(self.open_xml())
+            return
+        queue = [(self.response, 'start')]
         while queue:
             verb, event = queue.pop()
-            visited.add(verb)
             if event == 'start':
                 queue.append((verb, 'end',))
                 queue.extend(
@@ -143,25 +299,18 @@ class TwimlIR(object):
             yield verb, event
 
     def reverse_iter(self):
-        """Iterator to traverse the TwiML IR from leaves to parent."""
-        verb = self.response
-        visited, queue = set(), []
-        while not verb.is_leaf:
-            verb = verb.children[0]
+        """Iterator to traverse the TwiML IR from leaves to parent.
 
-        queue.append(verb)
+        Every verb comes after all its children (post-order), siblings in document order.
+        """
+        queue = [(self.response, False)]
         while queue:
-            verb = queue.pop()
-            if verb in visited:
-                continue
-            elif verb.children and len(set(verb.children) & visited) < len(verb.children):
-                queue.extend(verb.children)
-                continue
-            if verb.parent:
-                queue.append(verb.parent)
-                queue.extend(verb.siblings)
-            visited.add(verb)
-            yield verb
+            verb, children_visited = queue.pop()
+            if children_visited or verb.is_leaf:
+                yield verb
+            else:
+                queue.append((verb, True))
+                queue.extend((child, False) for child in reversed(verb.children))
 
     def get_verb_names(self, exclude_ssml_verbs=True):
         """Return a set of all verbs used."""
@@ -176,9 +325,17 @@ class TwimlIR(object):
 class TwimlIRVerb(object):
     """Internal Representation of a TwiML verb."""
 
+    # Every property of a verb, including the ones set by the language cleaners,
+    # is declared to save the memory of a per-instance __dict__
+    __slots__ = (
+        'name', 'attributes', 'text', 'parent', 'tail', 'is_ssml', 'children', 'depth',
+        'variable_name', 'method_name',
+    )
+
     def __init__(self, name, attributes, text, parent, tail, is_ssml):
-        self.name = name.replace('-', '_')
-        self.attributes = dict(attributes)
+        # Verb and attribute names come from a small vocabulary, shared between all verbs
+        self.name = sys.intern(name.replace('-', '_'))
+        self.attributes = {sys.intern(key): value for key, value in attributes.items()}
         self.text = text
         self.parent = parent
         self.tail = tail
@@ -190,6 +347,7 @@ class TwimlIRVerb(object):
         if self.parent:
             self.depth = self.parent.depth + 1
         self.variable_name = None
+        self.method_name = None
 
     @property
     def is_leaf(self):
@@ -213,16 +371,41 @@ class TwimlIRVerb(object):
             name=name,
             attributes={},
             text=text,
-            parent=self
+            parent=self,
+            tail=None,
+            is_ssml=self.is_ssml
         )
         self.children.append(newVerb)
 
+    def copy(self):
+        """Return a copy of this verb and all its descendants, detached from its parent."""
+        root = None
+        stack = [(self, None)]
+        while stack:
+            verb, parent = stack.pop()
+            # Copied slot by slot, cheaper than __init__ which cleans and interns the names again
+            verb_copy = object.__new__(TwimlIRVerb)
+            verb_copy.name = verb.name
+            verb_copy.attributes = dict(verb.attributes)
+            verb_copy.text = verb.text
+            verb_copy.parent = parent
+            verb_copy.tail = verb.tail
+            verb_copy.is_ssml = verb.is_ssml
+            verb_copy.children = []
+            verb_copy.depth = verb.depth
+            verb_copy.variable_name = verb.variable_name
+            verb_copy.method_name = verb.method_name
+            if parent is None:
+                root = verb_copy
+            else:
+                parent.children.append(verb_copy)
+            stack.extend((child, verb_copy) for child in reversed(verb.children))
+        return root
+
     @property
     def siblings(self):
-        """Return a set of all other siblings without this node."""
-        siblings = set(self.parent.children)
-        siblings.remove(self)
-        return siblings
+        """Return a list of all other siblings without this node, in document order."""
+        return [sibling for sibling in self.parent.children if sibling is not self]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,7 @@
+from twiml_generator.verification.aio import AsyncVerifier
+from twiml_generator.verification.cache import VerificationCache
+from twiml_generator.verification.common import VerificationResult
+from twiml_generator.verification.csharp import CSharpBatchVerifier
+from twiml_generator.verification.interpreters import InterpreterHarness, InterpreterHarnessPool
+from twiml_generator.verification.java import JavaBatchVerifier
+from twiml_generator.verification.scheduler import VerificationScheduler
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# coding: utf-8
+import asyncio
+import logging
+import os
+import subprocess
+
+from functools import partial
+
+from twiml_generator.formatting import FormattingError, get_format_command, get_formatter_name
+from twiml_generator.instrumentation import timed
+from twiml_generator.twiml_code_generator import PROJECT_DIRPATH, TwimlCodeGenerator
+from twiml_generator.verification.cache import SDK_VERSION_COMMANDS, sdk_fingerprints, \
+    sdk_version_fingerprint
+from twiml_generator.verification.common import VerificationResult
+from twiml_generator.verification.scheduler import SHARED_WORKSPACE_LANGUAGES
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AsyncVerifier(object):
+    """Generate, format and verify code on an asyncio event loop, without ever blocking it.
+
+    The commands run with `asyncio.create_subprocess_exec` and are killed when their job
+    times out or is cancelled, the code generation and the comparison of the trees run in
+    an executor (the default one of the loop if None).
+    """
+
+    def __init__(self, concurrency=None, default_concurrency=None, timeout=300, format_timeout=60,
+                 cache=None, executor=None):
+        """Construct a verifier.
+
+        `concurrency` maps a language to its maximum number of concurrent verifications,
+        the other languages use `default_concurrency` (the number of CPUs by default).
+        `timeout` is the maximum duration in seconds of the commands verifying a code, e.g. javac
+        then java, and `format_timeout` the one of a formatter command (None to wait forever).
+        `cache` is an optional VerificationCache.
+        """
+        self.concurrency = dict(concurrency or {})
+        self.default_concurrency = default_concurrency or os.cpu_count() or 1
+        self.timeout = timeout
+        self.format_timeout = format_timeout
+        self.cache = cache
+        self.executor = executor
+        self._semaphores = {}
+
+    def get_concurrency(self, language):
+        """Return the maximum number of verifications to run concurrently for a language."""
+        if language in SHARED_WORKSPACE_LANGUAGES:
+            return 1
+        return max(1, self.concurrency.get(language, self.default_concurrency))
+
+    def get_semaphore(self, language):
+        if language not in self._semaphores:
+            self._semaphores[language] = asyncio.BoundedSemaphore(self.get_concurrency(language))
+        return self._semaphores[language]
+
+    async def run_in_executor(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(function, *args, **kwargs)
+        )
+
+    @staticmethod
+    async def run_process(command, cwd=None, timeout=None, shell=False):
+        """Run a command, returning its CompletedProcess, killing it if timed out or cancelled.
+
+        A command that times out returns a CompletedProcess failing with a timeout message, like
+        the ones of an InterpreterHarness.
+        """
+        logger.debug('Running: %s', command if shell else ' '.join(command))
+        if shell:
+            process = await asyncio.create_subprocess_shell(
+                command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        else:
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            return subprocess.CompletedProcess(
+                command, 1, b'', 'Timed out after {:.1f} seconds\n'.format(timeout).encode()
+            )
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    @staticmethod
+    def send_command_result(commands, p):
+        """Return (False, next command) or (True, process to verify) from a commands generator.
+
+        The StopIteration of the generator cannot go through an executor future.
+        """
+        try:
+            return False, commands.send(p)
+        except StopIteration as e:
+            return True, e.value
+
+    async def run_commands(self, commands, timeout=None):
+        """Run the commands of a generator such as TwimlCodeGenerator.java_commands.
+
+        They must all end within `timeout` seconds. This is the asynchronous
+        TwimlCodeGenerator.run_commands, the generator is closed (e.g. removing its workspace)
+        even if cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        p = None
+        try:
+            while True:
+                # The generator prepares the commands on disk (e.g. copies the code to a workspace)
+                done, value = await self.run_in_executor(self.send_command_result, commands, p)
+                if done:
+                    return value
+                command, cwd = value
+                remaining = max(0, deadline - loop.time()) if deadline is not None else None
+                p = await self.run_process(command, cwd=cwd, timeout=remaining)
+        finally:
+            await self.run_in_executor(commands.close)
+
+    async def load_sdk_fingerprint(self, language):
+        """Compute the helper library fingerprint of a language, without blocking the loop."""
+        if language not in SDK_VERSION_COMMANDS or language in sdk_fingerprints:
+            return
+        try:
+            p = await self.run_process(SDK_VERSION_COMMANDS[language], cwd=str(PROJECT_DIRPATH),
+                                       timeout=self.timeout)
+        except OSError:
+            sdk_fingerprints[language] = ''
+        else:
+            sdk_fingerprints[language] = sdk_version_fingerprint(p)
+
+    async def generate(self, twiml_filepath=None, code_filepath=None, language='python',
+                       is_messaging=False, twimlir=None, twiml=None):
+        """Return a TwimlCodeGenerator whose code is written and formatted.
+
+        A FormattingError is raised if the code cannot be formatted, after writing it unformatted.
+        """
+        generator = await self.run_in_executor(
+            TwimlCodeGenerator, twiml_filepath, code_filepath=code_filepath, language=language,
+            is_messaging=is_messaging, twimlir=twimlir, twiml=twiml
+        )
+        # The formatter command, if any, runs asynchronously afterwards
+        await self.run_in_executor(generator.write_code, format=generator.has_in_process_formatter)
+        await self.format(generator)
+        return generator
+
+    async def format(self, generator):
+        """Run the formatter command on the written code, if not formatted in-process."""
+        formatter_command = generator.emitter.formatter
+        format_command = get_format_command(formatter_command, [generator.code_filepath])
+        if not format_command or generator.has_in_process_formatter:
+            return
+        with timed('format', generator.emitter.language, generator.twiml_filepath):
+            p = await self.run_process(format_command, timeout=self.format_timeout, shell=True)
+        if p.returncode != 0:
+            raise FormattingError('{} failed on {}: {}'.format(
+                get_formatter_name(formatter_command), generator.code_filepath,
+                p.stderr.decode(errors='replace').strip()
+            ))
+
+    async def verify(self, generator):
+        """Verify the written code of a generator, reporting any error in the VerificationResult."""
+        language = generator.emitter.language
+        try:
+            if self.cache is not None:
+                await self.load_sdk_fingerprint(language)
+                cached_result = await self.run_in_executor(self.cache.get, generator)
+                if cached_result is not None:
+                    await self.run_in_executor(generator.restore_differences, cached_result)
+                    return VerificationResult(generator, *cached_result, error=None)
+            async with self.get_semaphore(language):
+                with timed('verify', language, generator.twiml_filepath):
+                    commands = generator.verification_commands()
+                    p = await self.run_commands(commands, timeout=self.timeout)
+                    result = await self.run_in_executor(generator.verify_process, p)
+            if self.cache is not None:
+                await self.run_in_executor(self.cache.put, generator, result)
+            return VerificationResult(generator, *result, error=None)
+        except Exception as e:
+            logger.debug('Verification of %s failed: %s', generator.code_filepath, e)
+            return VerificationResult(generator, None, None, None, None, error=e)
+
+    async def generate_and_verify(self, twiml_filepath=None, language='python', **kwargs):
+        """Generate, format and verify the code of a TwiML, returning a VerificationResult.
+
+        The keyword arguments are the ones of `generate`. If the code cannot be generated
+        or formatted, the generator of the result is None and its error is set.
+        """
+        try:
+            generator = await self.generate(twiml_filepath, language=language, **kwargs)
+        except Exception as e:
+            logger.debug('Cannot generate %s code for %s: %s', language, twiml_filepath, e)
+            return VerificationResult(None, None, None, None, None, error=e)
+        return await self.verify(generator)
+
+    async def verify_all(self, generators):
+        """Verify the written code of many generators concurrently, returning the results in order.
+
+        Cancelling it cancels every verification, killing the running commands.
+        """
+        return await asyncio.gather(*(self.verify(generator) for generator in generators))
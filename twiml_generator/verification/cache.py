@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding: utf-8
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+
+from contextlib import suppress
+from pathlib import Path
+
+from twiml_generator.twiml_code_generator import PROJECT_DIRPATH
+from twiml_generator.verification.common import VerificationResult
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Commands printing the version of the helper library used to verify each language, run in
+# PROJECT_DIRPATH where the libraries are installed
+SDK_VERSION_COMMANDS = {
+    'node': ['node', '-p', "require('twilio/package.json').version"],
+    'php': ['php', '-r', "require './vendor/autoload.php'; echo Twilio\\VersionInfo::string();"],
+    'python': ['python', '-c', 'import twilio; print(twilio.__version__)'],
+    'ruby': ['ruby', '-e', "require 'twilio-ruby'; puts Twilio::VERSION"],
+}
+
+
+# Fingerprints of the helper libraries, computed once per process
+sdk_fingerprints = {}
+
+
+def sdk_version_fingerprint(p):
+    """Return the fingerprint of a language from the process of its SDK_VERSION_COMMANDS."""
+    return '{} {}'.format(p.returncode, p.stdout.decode(errors='replace').strip())
+
+
+def sdk_fingerprint(language, lib_filepath=None):
+    """Return a string identifying the helper library version used to verify a language.
+
+    For Java, it is the list of jars in the lib folder, for C# the dotnet projects
+    referencing the package, for the other languages the output of a command printing
+    the version (computed once per process).
+    """
+    if language == 'java':
+        jars = sorted(lib_filepath.glob('*.jar')) if lib_filepath and lib_filepath.is_dir() else []
+        return '\n'.join('{} {}'.format(jar.name, jar.stat().st_size) for jar in jars)
+    elif language == 'csharp':
+        projects = sorted(PROJECT_DIRPATH.glob('dotnet*_env/*.csproj'))
+        return '\n'.join(project.read_text(encoding='utf-8') for project in projects)
+    if language not in sdk_fingerprints:
+        try:
+            p = subprocess.run(SDK_VERSION_COMMANDS[language], cwd=str(PROJECT_DIRPATH),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError:
+            sdk_fingerprints[language] = ''
+        else:
+            sdk_fingerprints[language] = sdk_version_fingerprint(p)
+    return sdk_fingerprints[language]
+
+
+class VerificationCache(object):
+    """On-disk cache of verification results.
+
+    Entries are keyed by a hash of the generated code, the input TwiML, the language and
+    the helper library version. Only the successes and failures are cached, as errors may
+    come from the environment (e.g. a missing library or a timeout).
+    """
+
+    CACHED_RESULTS = (0, 1)  # TwimlCodeGenerator.VERIFY_SUCCESS, TwimlCodeGenerator.VERIFY_FAILURE
+
+    def __init__(self, dirpath='.verification_cache', max_entries=10000, max_age=30 * 24 * 3600):
+        self.dirpath = Path(dirpath)
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+    def key(self, generator):
+        """Return the cache key of the written code of a generator, None if it cannot be read."""
+        language = generator.emitter.language
+        try:
+            code = generator.code_filepath.read_bytes()
+        except OSError:
+            # The code is not written, its verification reports the error and is not cached
+            return None
+        digest = hashlib.sha256()
+        for part in (
+            language.encode(),
+            sdk_fingerprint(language, generator.lib_filepath).encode(),
+            code,
+            generator.read_twiml(),
+        ):
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def get_entry_filepath(self, key):
+        return self.dirpath / key[:2] / (key + '.json')
+
+    def get(self, generator):
+        """Return the cached verify() result of a generator, None if not cached."""
+        key = self.key(generator)
+        if key is None:
+            return None
+        entry_filepath = self.get_entry_filepath(key)
+        try:
+            with entry_filepath.open(encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(str(entry_filepath))
+        except (OSError, ValueError):
+            return None
+        logger.debug('Verification cache hit: %s', generator.code_filepath)
+        return entry['result'], entry['stdout'], entry['input_tree'], entry['output_tree']
+
+    def put(self, generator, verify_result):
+        """Store the verify() result of a generator."""
+        key = self.key(generator)
+        if verify_result[0] not in self.CACHED_RESULTS or key is None:
+            return
+        entry_filepath = self.get_entry_filepath(key)
+        entry_filepath.parent.mkdir(parents=True, exist_ok=True)
+        result, stdout, input_tree, output_tree = verify_result
+        fd, tmp_filepath = tempfile.mkstemp(dir=str(entry_filepath.parent), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({
+                'result': result,
+                'stdout': stdout,
+                'input_tree': input_tree,
+                'output_tree': output_tree,
+            }, f)
+        os.replace(tmp_filepath, str(entry_filepath))
+
+    def verify_batch(self, verify, generators):
+        """Return the VerificationResult of every generator, calling `verify` on the cache misses.
+
+        `verify` takes a list of generators and returns their VerificationResult, e.g.
+        JavaBatchVerifier.verify.
+        """
+        generators = list(generators)
+        results = {}
+        misses = []
+        for generator in generators:
+            cached = self.get(generator)
+            if cached is None:
+                misses.append(generator)
+            else:
+                generator.restore_differences(cached)
+                results[generator] = VerificationResult(generator, *cached, error=None)
+        for verification_result in verify(misses) if misses else []:
+            if verification_result.error is None:
+                self.put(verification_result.generator, verification_result[1:5])
+            results[verification_result.generator] = verification_result
+        return [results[generator] for generator in generators]
+
+    def evict(self):
+        """Remove the entries unused for `max_age` seconds, then the least recently used ones.
+
+        At most `max_entries` entries are kept.
+        """
+        entries = []
+        for entry_filepath in self.dirpath.glob('*/*.json'):
+            with suppress(OSError):
+                entries.append((entry_filepath.stat().st_mtime, entry_filepath))
+        entries.sort(reverse=True)
+        expiration_time = time.time() - self.max_age
+        for index, (mtime, entry_filepath) in enumerate(entries):
+            if index >= self.max_entries or mtime < expiration_time:
+                with suppress(OSError):
+                    entry_filepath.unlink()
+
+    def clear(self):
+        """Remove all the entries."""
+        for entry_filepath in self.dirpath.glob('*/*.json'):
+            with suppress(OSError):
+                entry_filepath.unlink()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# coding: utf-8
+from collections import namedtuple
+from pathlib import Path
+
+VerificationResult = namedtuple(
+    'VerificationResult',
+    ['generator', 'result', 'stdout', 'input_tree', 'output_tree', 'error']
+)
+
+HARNESS_DIRPATH = Path(__file__).parent / 'harness'
+
+HARNESS_MARKER = b'\0twiml-harness '
+
+
+def parse_harness_output(output):
+    """Parse the output of a batch harness.
+
+    Return a dict mapping each snippet name to its (exit code, stdout, stderr), stopping
+    at the first truncated entry (e.g. if the harness crashed).
+    """
+    results = {}
+    position = output.find(HARNESS_MARKER)
+    while position != -1:
+        header_end = output.find(b'\n', position)
+        if header_end == -1:
+            break
+        header = output[position + len(HARNESS_MARKER):header_end].decode('utf-8').split(' ')
+        if len(header) != 4:
+            break
+        name = header[0]
+        exit_code, stdout_length, stderr_length = int(header[1]), int(header[2]), int(header[3])
+        stdout_start = header_end + 1
+        stderr_start = stdout_start + stdout_length
+        stderr_end = stderr_start + stderr_length
+        if stderr_end > len(output):
+            break
+        results[name] = (
+            exit_code, output[stdout_start:stderr_start], output[stderr_start:stderr_end]
+        )
+        position = output.find(HARNESS_MARKER, stderr_end)
+    return results
+
+
+def verification_results(generators, processes):
+    """Verify the process of each generator, returning a VerificationResult per generator."""
+    results = []
+    for generator, p in zip(generators, processes):
+        try:
+            results.append(VerificationResult(generator, *generator.verify_process(p), error=None))
+        except Exception as e:
+            results.append(VerificationResult(generator, None, None, None, None, error=e))
+    return results
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# coding: utf-8
+import logging
+import re
+import shutil
+import subprocess
+import threading
+
+from pathlib import Path
+
+from twiml_generator.instrumentation import timed
+from twiml_generator.twiml_code_generator import PROJECT_DIRPATH
+from twiml_generator.verification.common import HARNESS_DIRPATH, parse_harness_output, \
+    verification_results
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MSBUILD_ERROR_RE = re.compile(r'^\s*(.+\.cs)\(\d+,\d+\): error ')
+
+
+def split_msbuild_errors(output):
+    """Return a dict mapping each source file with errors to its error lines in the build output."""
+    errors = {}
+    for line in output.splitlines(keepends=True):
+        match = MSBUILD_ERROR_RE.match(line)
+        if match and line not in errors.get(match.group(1), ''):
+            errors[match.group(1)] = errors.get(match.group(1), '') + line
+    return errors
+
+
+class CSharpBatchVerifier(object):
+    """Verify many C# generators with a single build of a reusable dotnet project.
+
+    Every snippet is compiled in its own namespace in the same project, along with a
+    TwimlHarness entry point which runs each snippet's Main in a single process.
+    The project is created (and the Twilio package restored) only once.
+    """
+
+    harness_filepath = HARNESS_DIRPATH / 'TwimlHarness.cs'
+
+    # Verifications sharing a project directory must not run at the same time
+    _project_locks = {}
+    _project_locks_lock = threading.Lock()
+
+    def __init__(self, project_dirpath=PROJECT_DIRPATH / 'dotnet_batch_env'):
+        self.project_dirpath = Path(project_dirpath).resolve()
+        with self._project_locks_lock:
+            self.lock = self._project_locks.setdefault(str(self.project_dirpath), threading.Lock())
+
+    @property
+    def snippets_dirpath(self):
+        return self.project_dirpath / 'snippets'
+
+    @property
+    def output_dirpath(self):
+        return self.project_dirpath / 'out'
+
+    def run_dotnet(self, command, **kwargs):
+        logger.debug('Running: %s', ' '.join(command))
+        return subprocess.run(command, cwd=str(self.project_dirpath),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+    def prepare_project(self):
+        """Create the project if needed, return the failed process if it cannot be created."""
+        if list(self.project_dirpath.glob('*.csproj')):
+            return None
+        self.project_dirpath.mkdir(parents=True, exist_ok=True)
+        for command in (['dotnet', 'new', 'console'], ['dotnet', 'add', 'package', 'Twilio']):
+            p = self.run_dotnet(command)
+            if p.returncode != 0:
+                # A partial project (e.g. its Program.cs) would make the next `dotnet new` fail
+                shutil.rmtree(str(self.project_dirpath), ignore_errors=True)
+                return p
+        (self.project_dirpath / 'Program.cs').unlink()
+        return None
+
+    def verify(self, generators):
+        """Verify the written code of every generator, returning a VerificationResult for each."""
+        if not shutil.which('dotnet'):
+            raise Exception('You need to install dotnet core if you want to verify a C# file')
+
+        generators = list(generators)
+        if not generators:
+            return []
+        with timed('verify', 'csharp'), self.lock:
+            p = self.prepare_project()
+            if p is not None:
+                return verification_results(generators, [p] * len(generators))
+
+            shutil.rmtree(str(self.snippets_dirpath), ignore_errors=True)
+            self.snippets_dirpath.mkdir()
+            shutil.copy(str(self.harness_filepath),
+                        str(self.snippets_dirpath / self.harness_filepath.name))
+
+            # Every snippet declares the same Example class, so each one gets its own namespace
+            sources = {}
+            for index, generator in enumerate(generators):
+                source_filepath = self.snippets_dirpath / 'Snippet{}.cs'.format(index)
+                code = generator.code_filepath.read_text(encoding='utf-8')
+                source_filepath.write_text('namespace Snippet{}\n{{\n{}\n}}\n'.format(index, code),
+                                           encoding='utf-8')
+                sources[index] = source_filepath
+
+            processes = self.build(sources)
+            built = [index for index in sources if index not in processes]
+            processes.update(self.run(built))
+            return verification_results(
+                generators, [processes[index] for index in range(len(generators))]
+            )
+
+    def build(self, sources):
+        """Build the project, removing the sources that fail to compile.
+
+        Return a dict mapping the index of each source that does not compile to its build process.
+        """
+        failed = {}
+        pending = dict(sources)
+        while pending:
+            dotnet_build_command = [
+                'dotnet', 'build', '-nologo', '-o', str(self.output_dirpath),
+                '-p:AssemblyName=TwimlHarness', '-p:StartupObject=TwimlHarness',
+                '-p:ImplicitUsings=disable'
+            ]
+            p = self.run_dotnet(dotnet_build_command)
+            if p.returncode == 0:
+                break
+
+            errors = split_msbuild_errors(p.stdout.decode() + p.stderr.decode())
+            failing = [index for index, path in pending.items() if str(path) in errors]
+            if not failing:
+                # The failure cannot be attributed to a snippet, report it for all of them
+                for index in pending:
+                    failed[index] = p
+                break
+            for index in failing:
+                source_filepath = pending.pop(index)
+                source_filepath.unlink()
+                failed[index] = subprocess.CompletedProcess(
+                    dotnet_build_command, p.returncode, errors[str(source_filepath)].encode(), b''
+                )
+        return failed
+
+    def run(self, indexes):
+        """Run the built snippets in a single process.
+
+        Return a dict mapping the index of each snippet to its process.
+        """
+        if not indexes:
+            return {}
+        dotnet_command = ['dotnet', str(self.output_dirpath / 'TwimlHarness.dll')]
+        class_names = ['Snippet{}.Example'.format(index) for index in indexes]
+        p = self.run_dotnet(dotnet_command, input='\n'.join(class_names).encode())
+        harness_results = parse_harness_output(p.stdout)
+
+        processes = {}
+        for index, class_name in zip(indexes, class_names):
+            if class_name in harness_results:
+                returncode, stdout, stderr = harness_results[class_name]
+                processes[index] = subprocess.CompletedProcess(
+                    dotnet_command + [class_name], returncode, stdout, stderr
+                )
+            else:
+                # The harness stopped before running this snippet
+                processes[index] = subprocess.CompletedProcess(
+                    dotnet_command + [class_name], p.returncode or 1, b'', p.stdout + p.stderr
+                )
+        return processes
@@ -0,0 +1,65 @@
+using System;
+using System.IO;
+using System.Reflection;
+using System.Text;
+
+/// <summary>
+/// Run the Main method of every class read from stdin, one name per line, in this process.
+///
+/// For each class, writes to stdout a header line "\0twiml-harness <class> <exit code> <stdout length>
+/// <stderr length>" followed by the bytes the class wrote to stdout and stderr.
+/// </summary>
+static class TwimlHarness
+{
+    static void Main()
+    {
+        var encoding = new UTF8Encoding(false);
+        var stdout = Console.OpenStandardOutput();
+        var originalOut = Console.Out;
+        var originalErr = Console.Error;
+        string className;
+        while ((className = Console.In.ReadLine()) != null)
+        {
+            if (className.Length == 0)
+            {
+                continue;
+            }
+            var classOut = new StringWriter();
+            var classErr = new StringWriter();
+            var exitCode = 0;
+            Console.SetOut(classOut);
+            Console.SetError(classErr);
+            try
+            {
+                var main = Type.GetType(className, true).GetMethod(
+                    "Main", BindingFlags.Static | BindingFlags.Public | BindingFlags.NonPublic);
+                var parameters = main.GetParameters().Length == 0 ? null : new object[] { new string[0] };
+                main.Invoke(null, parameters);
+            }
+            catch (TargetInvocationException e)
+            {
+                exitCode = 1;
+                classErr.WriteLine(e.InnerException);
+            }
+            catch (Exception e)
+            {
+                exitCode = 1;
+                classErr.WriteLine(e);
+            }
+            finally
+            {
+                Console.SetOut(originalOut);
+                Console.SetError(originalErr);
+            }
+            var classOutBytes = encoding.GetBytes(classOut.ToString());
+            var classErrBytes = encoding.GetBytes(classErr.ToString());
+            var header = encoding.GetBytes(
+                "\0twiml-harness " + className + " " + exitCode + " "
+                + classOutBytes.Length + " " + classErrBytes.Length + "\n");
+            stdout.Write(header, 0, header.Length);
+            stdout.Write(classOutBytes, 0, classOutBytes.Length);
+            stdout.Write(classErrBytes, 0, classErrBytes.Length);
+            stdout.Flush();
+        }
+    }
+}
@@ -0,0 +1,52 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.nio.charset.StandardCharsets;
+
+/**
+ * Run the main method of every class read from stdin, one name per line, in this JVM.
+ *
+ * For each class, writes to stdout a header line "\0twiml-harness <class> <exit code> <stdout length>
+ * <stderr length>" followed by the bytes the class wrote to stdout and stderr.
+ */
+public class TwimlHarness {
+    public static void main(String[] args) throws Exception {
+        PrintStream out = System.out;
+        PrintStream err = System.err;
+        BufferedReader classNames = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String className;
+        while ((className = classNames.readLine()) != null) {
+            if (className.isEmpty()) {
+                continue;
+            }
+            ByteArrayOutputStream classOut = new ByteArrayOutputStream();
+            ByteArrayOutputStream classErr = new ByteArrayOutputStream();
+            int exitCode = 0;
+            System.setOut(new PrintStream(classOut, true, "UTF-8"));
+            System.setErr(new PrintStream(classErr, true, "UTF-8"));
+            try {
+                Class.forName(className).getMethod("main", String[].class).invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                exitCode = 1;
+                e.getCause().printStackTrace();
+            } catch (Throwable e) {
+                exitCode = 1;
+                e.printStackTrace();
+            } finally {
+                System.out.flush();
+                System.err.flush();
+                System.setOut(out);
+                System.setErr(err);
+            }
+            byte[] classOutBytes = classOut.toByteArray();
+            byte[] classErrBytes = classErr.toByteArray();
+            String header = "\0twiml-harness " + className + " " + exitCode + " " + classOutBytes.length + " " + classErrBytes.length + "\n";
+            out.write(header.getBytes(StandardCharsets.UTF_8));
+            out.write(classOutBytes);
+            out.write(classErrBytes);
+            out.flush();
+        }
+    }
+}
@@ -0,0 +1,45 @@
+// Run the Node.js files requested on stdin in this process.
+//
+// Each request is a JSON line {"path": ...}, each response a JSON line
+// {"exit_code": ..., "stdout": ..., "stderr": ...} prefixed by "\0twiml-harness ".
+const fs = require('fs');
+const Module = require('module');
+const path = require('path');
+const readline = require('readline');
+const util = require('util');
+const vm = require('vm');
+
+const MARKER = '\0twiml-harness ';
+
+function run(filepath) {
+  const stdout = [];
+  const stderr = [];
+  const write = (stream) => (...args) => stream.push(util.format(...args) + '\n');
+  const snippetConsole = {
+    log: write(stdout),
+    info: write(stdout),
+    error: write(stderr),
+    warn: write(stderr),
+  };
+  let exitCode = 0;
+  try {
+    const code = fs.readFileSync(filepath, 'utf8');
+    const wrapper = vm.runInThisContext(
+      '(function (exports, require, module, __filename, __dirname, console) {' + code + '\n})',
+      { filename: filepath }
+    );
+    const snippetModule = { exports: {} };
+    wrapper.call(snippetModule.exports, snippetModule.exports, Module.createRequire(filepath),
+      snippetModule, filepath, path.dirname(filepath), snippetConsole);
+  } catch (e) {
+    exitCode = 1;
+    stderr.push(String((e && e.stack) || e) + '\n');
+  }
+  return { exit_code: exitCode, stdout: stdout.join(''), stderr: stderr.join('') };
+}
+
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  if (line.trim()) {
+    process.stdout.write(MARKER + JSON.stringify(run(JSON.parse(line).path)) + '\n');
+  }
+});
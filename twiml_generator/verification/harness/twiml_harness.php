@@ -0,0 +1,37 @@
+<?php
+// Run the PHP files requested on stdin in this process.
+//
+// Each request is a JSON line {"path": ...}, each response a JSON line
+// {"exit_code": ..., "stdout": ..., "stderr": ...} prefixed by "\0twiml-harness ".
+
+const MARKER = "\0twiml-harness ";
+
+function twiml_harness_include($path)
+{
+    // Included from a function so snippets do not share variables
+    include $path;
+}
+
+function twiml_harness_run($path)
+{
+    $exitCode = 0;
+    $stderr = '';
+    ob_start();
+    try {
+        twiml_harness_include($path);
+    } catch (Throwable $e) {
+        $exitCode = 1;
+        $stderr = (string) $e . "\n";
+    }
+    $stdout = ob_get_clean();
+    return ['exit_code' => $exitCode, 'stdout' => $stdout, 'stderr' => $stderr];
+}
+
+while (($line = fgets(STDIN)) !== false) {
+    if (trim($line) === '') {
+        continue;
+    }
+    $request = json_decode($line, true);
+    fwrite(STDOUT, MARKER . json_encode(twiml_harness_run($request['path'])) . "\n");
+    fflush(STDOUT);
+}
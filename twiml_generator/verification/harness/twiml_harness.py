@@ -0,0 +1,39 @@
+"""Run the Python files requested on stdin in this interpreter.
+
+Each request is a JSON line {"path": ...}, each response a JSON line
+{"exit_code": ..., "stdout": ..., "stderr": ...} prefixed by "\\0twiml-harness ".
+"""
+import contextlib
+import io
+import json
+import runpy
+import sys
+import traceback
+
+MARKER = '\0twiml-harness '
+
+
+def run(path):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            runpy.run_path(path, run_name='__main__')
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            exit_code = 1
+            traceback.print_exc()
+    return {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def main():
+    out = sys.stdout
+    for line in sys.stdin:
+        if line.strip():
+            out.write(MARKER + json.dumps(run(json.loads(line)['path'])) + '\n')
+            out.flush()
+
+
+if __name__ == '__main__':
+    main()
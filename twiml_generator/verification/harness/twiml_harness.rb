@@ -0,0 +1,36 @@
+# Run the Ruby files requested on stdin in this interpreter.
+#
+# Each request is a JSON line {"path": ...}, each response a JSON line
+# {"exit_code": ..., "stdout": ..., "stderr": ...} prefixed by "\0twiml-harness ".
+require 'json'
+require 'stringio'
+
+MARKER = "\0twiml-harness ".freeze
+
+def run(path)
+  stdout = StringIO.new
+  stderr = StringIO.new
+  exit_code = 0
+  $stdout = stdout
+  $stderr = stderr
+  begin
+    # Wrapped in an anonymous module so snippets do not share constants and methods
+    load path, true
+  rescue SystemExit => e
+    exit_code = e.status
+  rescue Exception => e
+    exit_code = 1
+    stderr.puts "#{e.class}: #{e.message}", e.backtrace
+  ensure
+    $stdout = STDOUT
+    $stderr = STDERR
+  end
+  { exit_code: exit_code, stdout: stdout.string, stderr: stderr.string }
+end
+
+STDIN.each_line do |line|
+  next if line.strip.empty?
+
+  STDOUT.write(MARKER + JSON.generate(run(JSON.parse(line)['path'])) + "\n")
+  STDOUT.flush
+end
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding: utf-8
+import json
+import logging
+import queue
+import subprocess
+import threading
+
+from contextlib import suppress
+
+from twiml_generator.verification.common import HARNESS_DIRPATH, HARNESS_MARKER
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HARNESS_SCRIPTS = {
+    'node': 'twiml_harness.js',
+    'php': 'twiml_harness.php',
+    'python': 'twiml_harness.py',
+    'ruby': 'twiml_harness.rb',
+}
+
+
+class InterpreterHarness(object):
+    """Long-lived interpreter running the code of many generators of a language.
+
+    The interpreter loads the helper library once and runs each snippet in its own
+    scope, talking over stdin/stdout. It is restarted if it crashes or hangs.
+    """
+
+    def __init__(self, language, timeout=60):
+        if language not in HARNESS_SCRIPTS:
+            raise ValueError('No interpreter harness for {}'.format(language))
+        self.language = language
+        self.timeout = timeout
+        self.command = [language, str(HARNESS_DIRPATH / HARNESS_SCRIPTS[language])]
+        self.process = None
+        self.responses = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        logger.debug('Starting harness: %s', ' '.join(self.command))
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.responses = queue.Queue()
+        threading.Thread(target=self.read_responses, args=(self.process, self.responses),
+                         daemon=True).start()
+
+    @staticmethod
+    def read_responses(process, responses):
+        """Forward the responses of the harness to a queue, ending with None when it exits."""
+        for line in process.stdout:
+            position = line.find(HARNESS_MARKER)
+            if position != -1:
+                responses.put(line[position + len(HARNESS_MARKER):])
+        responses.put(None)
+
+    def close(self):
+        """Stop the interpreter, it is started again on the next run."""
+        if self.process:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            with suppress(OSError):
+                self.process.stdin.close()
+        self.process = None
+
+    def run(self, generator):
+        """Run the written code of a generator, returning a CompletedProcess as if run directly."""
+        code_filepath = str(generator.code_filepath.resolve())
+        args = self.command + [code_filepath]
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            try:
+                self.process.stdin.write(json.dumps({'path': code_filepath}).encode() + b'\n')
+                self.process.stdin.flush()
+                response = self.responses.get(timeout=self.timeout)
+            except BrokenPipeError:
+                response = None
+            except queue.Empty:
+                self.close()
+                return subprocess.CompletedProcess(
+                    args, 1, b'', 'Timed out after {} seconds\n'.format(self.timeout).encode()
+                )
+            if response is None:
+                self.close()
+                return subprocess.CompletedProcess(
+                    args, 1, b'', b'The interpreter harness exited\n'
+                )
+
+        response = json.loads(response.decode('utf-8'))
+        return subprocess.CompletedProcess(
+            args, response['exit_code'],
+            response['stdout'].encode('utf-8'), response['stderr'].encode('utf-8')
+        )
+
+
+class InterpreterHarnessPool(object):
+    """Pool of interpreter harnesses of a language, to run up to `size` snippets at once."""
+
+    def __init__(self, language, size=1, timeout=60):
+        self.harnesses = queue.Queue()
+        self.all_harnesses = [
+            InterpreterHarness(language, timeout=timeout) for _ in range(max(1, size))
+        ]
+        for harness in self.all_harnesses:
+            self.harnesses.put(harness)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, generator):
+        harness = self.harnesses.get()
+        try:
+            return harness.run(generator)
+        finally:
+            self.harnesses.put(harness)
+
+    def close(self):
+        for harness in self.all_harnesses:
+            harness.close()
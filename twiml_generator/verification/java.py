@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# coding: utf-8
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from pathlib import Path
+
+from twiml_generator.instrumentation import timed
+from twiml_generator.verification.common import HARNESS_DIRPATH, parse_harness_output, \
+    verification_results
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+JAVAC_MESSAGE_RE = re.compile(r'^(.+\.java):\d+: (error|warning): ')
+JAVAC_SUMMARY_RE = re.compile(r'^\d+ (errors?|warnings?)$')
+
+
+def split_javac_errors(output):
+    """Return a dict mapping each source file with errors to its part of the javac output."""
+    errors = {}
+    current_filepath = None
+    for line in output.splitlines(keepends=True):
+        match = JAVAC_MESSAGE_RE.match(line)
+        if match:
+            current_filepath = match.group(1) if match.group(2) == 'error' else None
+        elif JAVAC_SUMMARY_RE.match(line.strip()):
+            current_filepath = None
+        if current_filepath:
+            errors[current_filepath] = errors.get(current_filepath, '') + line
+    return errors
+
+
+class JavaBatchVerifier(object):
+    """Verify many Java generators with a single javac call and a single JVM."""
+
+    harness_filepath = HARNESS_DIRPATH / 'TwimlHarness.java'
+
+    def __init__(self, lib_filepath=None):
+        if lib_filepath:
+            self.lib_filepath = Path(lib_filepath).resolve()
+        else:
+            self.lib_filepath = None
+
+    def verify(self, generators):
+        """Verify the written code of every generator, returning a VerificationResult for each."""
+        if not shutil.which('java'):
+            raise Exception('You need to install java if you want to verify a java file')
+
+        generators = list(generators)
+        if not generators:
+            return []
+        lib_filepath = self.lib_filepath or generators[0].lib_filepath
+        with timed('verify', 'java'), \
+                tempfile.TemporaryDirectory(prefix='twiml-java-batch-') as workspace:
+            workspace = Path(workspace)
+            classes_dirpath = workspace / 'classes'
+            classes_dirpath.mkdir()
+            classpath = os.pathsep.join([str(lib_filepath / '*'), str(classes_dirpath)])
+
+            # Every snippet declares the same Example class, so each one gets its own package
+            sources = {}
+            for index, generator in enumerate(generators):
+                package = 'snippet{}'.format(index)
+                source_filepath = workspace / 'src' / package / 'Example.java'
+                source_filepath.parent.mkdir(parents=True)
+                code = generator.code_filepath.read_text(encoding='utf-8')
+                source_filepath.write_text('package {};\n{}'.format(package, code),
+                                           encoding='utf-8')
+                sources[index] = source_filepath
+
+            processes = self.compile(sources, classpath, workspace)
+            compiled = [index for index in sources if index not in processes]
+            processes.update(self.run(compiled, classpath, workspace))
+            return verification_results(
+                generators, [processes[index] for index in range(len(generators))]
+            )
+
+    def compile(self, sources, classpath, workspace):
+        """Compile the harness and all the sources with javac, excluding the ones that fail.
+
+        Return a dict mapping the index of each source that does not compile to its javac process.
+        """
+        failed = {}
+        pending = dict(sources)
+        while pending:
+            argfile = workspace / 'sources.txt'
+            argfile.write_text('\n'.join(
+                '"{}"'.format(str(path).replace('\\', '\\\\'))
+                for path in [self.harness_filepath] + list(pending.values())
+            ), encoding='utf-8')
+            javac_command = ['javac', '-encoding', 'UTF-8', '-cp', classpath,
+                             '-d', str(workspace / 'classes'), '@' + str(argfile)]
+            logger.debug('Running : %s (%s sources)', ' '.join(javac_command), len(pending))
+            p = subprocess.run(javac_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if p.returncode == 0:
+                break
+
+            errors = split_javac_errors(p.stdout.decode() + p.stderr.decode())
+            failing = [index for index, path in pending.items() if str(path) in errors]
+            if not failing:
+                # The failure cannot be attributed to a snippet, report it for all of them
+                for index in pending:
+                    failed[index] = p
+                break
+            for index in failing:
+                failed[index] = subprocess.CompletedProcess(
+                    javac_command, p.returncode, b'', errors[str(pending.pop(index))].encode()
+                )
+        return failed
+
+    def run(self, indexes, classpath, workspace):
+        """Run the compiled snippets in a single JVM.
+
+        Return a dict mapping the index of each snippet to its process.
+        """
+        if not indexes:
+            return {}
+        java_command = ['java', '-cp', classpath, 'TwimlHarness']
+        class_names = ['snippet{}.Example'.format(index) for index in indexes]
+        logger.debug('Running : %s (%s classes)', ' '.join(java_command), len(class_names))
+        p = subprocess.run(java_command, cwd=str(workspace), input='\n'.join(class_names).encode(),
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        harness_results = parse_harness_output(p.stdout)
+
+        processes = {}
+        for index, class_name in zip(indexes, class_names):
+            if class_name in harness_results:
+                returncode, stdout, stderr = harness_results[class_name]
+                processes[index] = subprocess.CompletedProcess(
+                    java_command + [class_name], returncode, stdout, stderr
+                )
+            else:
+                # The harness stopped before running this snippet
+                processes[index] = subprocess.CompletedProcess(
+                    java_command + [class_name], p.returncode or 1, b'', p.stderr
+                )
+        return processes
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from twiml_generator.verification.common import VerificationResult
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# Languages whose verification may create a project shared by every job
+SHARED_WORKSPACE_LANGUAGES = {'csharp'}
+
+
+class VerificationScheduler(object):
+    """Run the verification of many generators concurrently, with a worker pool per language."""
+
+    def __init__(self, concurrency=None, default_concurrency=None, runners=None, cache=None):
+        """Construct a scheduler.
+
+        `concurrency` maps a language to its maximum number of concurrent verifications,
+        the other languages use `default_concurrency` (the number of CPUs by default).
+        `runners` maps a language to the runner given to `verify()`, e.g. an InterpreterHarnessPool,
+        and `cache` is an optional VerificationCache.
+        """
+        self.concurrency = dict(concurrency or {})
+        self.default_concurrency = default_concurrency or os.cpu_count() or 1
+        self.runners = dict(runners or {})
+        self.cache = cache
+        self._executors = {}
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown(wait=exc_info[0] is None)
+
+    def get_concurrency(self, language):
+        """Return the maximum number of verifications to run concurrently for a language."""
+        if language in SHARED_WORKSPACE_LANGUAGES:
+            return 1
+        return max(1, self.concurrency.get(language, self.default_concurrency))
+
+    def get_executor(self, language):
+        if language not in self._executors:
+            self._executors[language] = ThreadPoolExecutor(
+                max_workers=self.get_concurrency(language),
+                thread_name_prefix='verify-{}'.format(language)
+            )
+        return self._executors[language]
+
+    def submit(self, generator):
+        """Schedule the verification of a generator and return its future."""
+        language = generator.emitter.language
+        future = self.get_executor(language).submit(
+            self.verify, generator, self.runners.get(language), self.cache
+        )
+        self._futures.append(future)
+        return future
+
+    @staticmethod
+    def verify(generator, runner=None, cache=None):
+        """Verify a generator, catching any error to report it in the result."""
+        try:
+            result = generator.verify(runner=runner, cache=cache)
+            return VerificationResult(generator, *result, error=None)
+        except Exception as e:
+            logger.debug('Verification of %s failed: %s', generator.code_filepath, e)
+            return VerificationResult(generator, None, None, None, None, error=e)
+
+    def as_completed(self):
+        """Yield the VerificationResult of each scheduled verification as soon as it finishes."""
+        for future in as_completed(self._futures):
+            yield future.result()
+
+    def results(self):
+        """Wait for all the scheduled verifications and return their results in submission order."""
+        return [future.result() for future in self._futures]
+
+    def shutdown(self, wait=True):
+        """Stop the worker pools, cancelling the pending verifications if not waiting."""
+        if not wait:
+            for future in self._futures:
+                future.cancel()
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+        self._executors = {}